@@ -0,0 +1,222 @@
+"""
+Message retention tiering.
+
+Hot tier: the `messages` table, kept to the last MESSAGE_RETENTION_DAYS so the
+newest-N, per-user timeline and summary queries run against a small working set.
+
+Cold tier: older messages are moved, one UTC day at a time, into
+message_archive_days (a zlib-compressed JSON-lines blob per day plus the day's
+distinct words, used to narrow searches) and message_archive_index (message id -> day, with
+user_id/created_at for keyset scroll-back). Reads decode only the days they need.
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+import zlib
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import and_, delete, func, or_, select
+
+from database import unit_of_work
+from models import ArchivedDay as ArchivedDayORM, ArchivedMessage as ArchivedMessageORM, Message as MessageORM
+
+# Messages older than this many days leave the hot table; 0 disables archiving.
+MESSAGE_RETENTION_DAYS = int(os.getenv("MESSAGE_RETENTION_DAYS", "30"))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv("ARCHIVE_INTERVAL_HOURS", "6"))
+ARCHIVE_MAX_DAYS_PER_RUN = int(os.getenv("ARCHIVE_MAX_DAYS_PER_RUN", "30"))
+
+_FIELDS = ("id", "user_id", "sender_id", "sender_name", "role", "content")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _encode(messages: list[MessageORM]) -> bytes:
+    lines = (json.dumps({**{f: getattr(m, f) for f in _FIELDS}, "created_at": m.created_at.isoformat()})
+             for m in messages)
+    return zlib.compress("\n".join(lines).encode(), 6)
+
+
+def decode_day(row: ArchivedDayORM) -> list[MessageORM]:
+    """Messages of one archived day as transient Message objects, oldest first."""
+    out = []
+    for line in zlib.decompress(row.payload).decode().splitlines():
+        d = json.loads(line)
+        d["created_at"] = datetime.fromisoformat(d["created_at"])
+        out.append(MessageORM(**d))
+    return out
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    start = datetime.combine(day, dtime.min)
+    return start, start + timedelta(days=1)
+
+
+# ───────────────────────── reads (cold tier) ─────────────────────────
+
+def page_before(db, user_id: str, ts: datetime | None, msg_id: str | None, limit: int) -> list[MessageORM]:
+    """Archived messages of `user_id` just older than (ts, msg_id) (or the newest ones), oldest first."""
+    q = db.query(ArchivedMessageORM.id, ArchivedMessageORM.day).filter(ArchivedMessageORM.user_id == user_id)
+    if ts is not None:
+        q = q.filter(or_(ArchivedMessageORM.created_at < ts,
+                         and_(ArchivedMessageORM.created_at == ts, ArchivedMessageORM.id < msg_id)))
+    hits = q.order_by(ArchivedMessageORM.created_at.desc(), ArchivedMessageORM.id.desc()).limit(limit).all()
+    if not hits:
+        return []
+    wanted = {h.id for h in hits}
+    days = db.query(ArchivedDayORM).filter(ArchivedDayORM.day.in_({h.day for h in hits})).all()
+    found = [m for row in days for m in decode_day(row) if m.id in wanted]
+    found.sort(key=lambda m: (m.created_at, m.id))
+    return found
+
+
+def search(db, user_id: str, query: str, limit: int = 50) -> list[MessageORM]:
+    """`user_id`'s messages containing every whitespace-separated term of `query` as a
+    case-insensitive substring, newest first: hot table, then the archive."""
+    terms = query.lower().split()
+    if not terms:
+        return []
+    hot = db.query(MessageORM).filter(MessageORM.user_id == user_id)
+    for t in terms:
+        hot = hot.filter(MessageORM.content.icontains(t, autoescape=True))
+    results = hot.order_by(MessageORM.created_at.desc(), MessageORM.id.desc()).limit(limit).all()
+    if len(results) < limit:
+        results += _search_archive(db, user_id, terms, limit - len(results))
+    return results
+
+
+def _search_archive(db, user_id: str, terms: list[str], limit: int) -> list[MessageORM]:
+    """Same rule as the hot tier. A day can only match if every alphanumeric run of every
+    term occurs in its word list, so only candidate blobs are decompressed."""
+    q = db.query(ArchivedDayORM)
+    for run in {r for t in terms for r in _WORD_RE.findall(t)}:
+        q = q.filter(ArchivedDayORM.terms.contains(run, autoescape=True))
+    results: list[MessageORM] = []
+    for row in q.order_by(ArchivedDayORM.day.desc()).yield_per(8):
+        for m in reversed(decode_day(row)):
+            text = (m.content or "").lower()
+            if m.user_id == user_id and all(t in text for t in terms):
+                results.append(m)
+                if len(results) >= limit:
+                    return results
+    return results
+
+
+async def aiter_after(db, after: tuple[datetime, str] | None):
+    """Async: archived messages newer than `after` (all of them if None), oldest first, one day at a time."""
+    stmt = select(ArchivedDayORM.day).order_by(ArchivedDayORM.day.asc())
+    if after is not None:
+        stmt = stmt.where(ArchivedDayORM.last_at >= after[0])
+    for day in (await db.execute(stmt)).scalars().all():
+        row = await db.get(ArchivedDayORM, day)
+        for m in decode_day(row):
+            if after is None or (m.created_at, m.id) > after:
+                yield m
+        db.expunge(row)
+
+
+async def aiter_between(db, start: datetime, end: datetime):
+    """Async: archived messages with start <= created_at < end, oldest first."""
+    stmt = (select(ArchivedDayORM.day)
+            .where(ArchivedDayORM.last_at >= start, ArchivedDayORM.first_at < end)
+            .order_by(ArchivedDayORM.day.asc()))
+    for day in (await db.execute(stmt)).scalars().all():
+        row = await db.get(ArchivedDayORM, day)
+        for m in decode_day(row):
+            if start <= m.created_at < end:
+                yield m
+        db.expunge(row)
+
+
+# ───────────────────────── archiver ─────────────────────────
+
+class MessageArchiver:
+    def __init__(self, retention_days: int = MESSAGE_RETENTION_DAYS):
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.days_archived = 0
+        self.messages_archived = 0
+        self.last_run_at: str | None = None
+
+    def cutoff_day(self) -> date:
+        return datetime.now(timezone.utc).date() - timedelta(days=self.retention_days)
+
+    def run_once(self, max_days: int = ARCHIVE_MAX_DAYS_PER_RUN) -> int:
+        """Move whole UTC days older than the retention window into the archive. Returns messages moved."""
+        if self.retention_days <= 0:
+            return 0
+        with self._lock:
+            moved = 0
+            cutoff_start, _ = _day_bounds(self.cutoff_day())
+            for _ in range(max_days):
+                with unit_of_work() as db:
+                    oldest = db.query(func.min(MessageORM.created_at)).filter(
+                        MessageORM.created_at < cutoff_start).scalar()
+                if oldest is None:
+                    break
+                moved += self._archive_day(oldest.date())
+            self.runs += 1
+            self.last_run_at = datetime.now(timezone.utc).isoformat()
+            if moved:
+                logger.info(f"Archived {moved} messages older than {cutoff_start.date()}")
+            return moved
+
+    def _archive_day(self, day: date) -> int:
+        """One short transaction per day: write the blob + index rows, delete the hot rows."""
+        start, end = _day_bounds(day)
+        with unit_of_work() as db:
+            msgs = (db.query(MessageORM)
+                    .filter(MessageORM.created_at >= start, MessageORM.created_at < end)
+                    .order_by(MessageORM.created_at.asc(), MessageORM.id.asc())
+                    .all())
+            if not msgs:
+                return 0
+            existing = db.get(ArchivedDayORM, day)
+            # Late writes into an already-archived day are merged into its blob.
+            merged = decode_day(existing) + msgs if existing else list(msgs)
+            merged.sort(key=lambda m: (m.created_at, m.id))
+            terms = set().union(*(_words(m.content) for m in merged))
+            db.merge(ArchivedDayORM(
+                day=day,
+                message_count=len(merged),
+                first_at=merged[0].created_at,
+                last_at=merged[-1].created_at,
+                terms=f" {' '.join(sorted(terms))} ",
+                payload=_encode(merged),
+                archived_at=datetime.now(timezone.utc).replace(tzinfo=None),
+            ))
+            db.add_all(ArchivedMessageORM(id=m.id, day=day, user_id=m.user_id, created_at=m.created_at)
+                       for m in msgs)
+            db.execute(delete(MessageORM).where(MessageORM.id.in_([m.id for m in msgs])))
+            moved = len(msgs)
+        self.days_archived += 1
+        self.messages_archived += moved
+        return moved
+
+    async def run_forever(self, interval_hours: float = ARCHIVE_INTERVAL_HOURS):
+        """Background loop started with the app; the work itself runs on a worker thread."""
+        while True:
+            try:
+                await asyncio.to_thread(self.run_once)
+            except Exception as e:
+                logger.warning(f"Message archive run failed: {e}")
+            await asyncio.sleep(interval_hours * 3600)
+
+    def stats(self) -> dict:
+        return {
+            "retention_days": self.retention_days,
+            "runs": self.runs,
+            "days_archived": self.days_archived,
+            "messages_archived": self.messages_archived,
+            "last_run_at": self.last_run_at,
+        }
+
+
+archiver = MessageArchiver()
@@ -0,0 +1,322 @@
+"""
+Per-user caches in front of the Composio API.
+
+ToolSchemaCache: OpenAI tool schemas per Composio user. A miss fetches every
+tool in ALL_COMPOSIO_TOOLS with one batched call; tools that are not connected
+are remembered as unavailable until the TTL expires or the user's connections
+change (/composio/connect, or a different toolkit set seen by /composio/status).
+Fetch errors are only remembered for COMPOSIO_TOOLS_ERROR_TTL, so an outage
+doesn't read as "not connected" for the whole TTL.
+
+StatusCache: connected-account status per user for /composio/status, served
+from memory for COMPOSIO_STATUS_TTL and refreshed in the background
+(stale-while-revalidate) so dashboard loads don't wait on the Composio API.
+An explicit ?refresh=1 bypasses it.
+
+AuthConfigIndex: toolkit -> auth config, loaded once at startup and reloaded
+only when a toolkit is missing, so /composio/connect makes one remote call.
+
+execute_tool: run one action with explicit arguments for fixed workflows
+(summary Doc/email, transcript Doc) that don't need an LLM to pick the call.
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from config import get_composio_client
+
+ALL_COMPOSIO_TOOLS = [
+    "GMAIL_SEND_EMAIL",
+    "GMAIL_FETCH_EMAILS",
+    "GMAIL_CREATE_EMAIL_DRAFT",
+    "GOOGLEDOCS_CREATE_DOCUMENT",
+    "GOOGLEDRIVE_FIND_FILE",
+    "GOOGLEDRIVE_CREATE_FILE",
+    "GOOGLECALENDAR_CREATE_EVENT",
+    "GOOGLECALENDAR_FIND_EVENT",
+]
+
+COMPOSIO_TOOLS_TTL = float(os.getenv("COMPOSIO_TOOLS_TTL", "600"))
+# Tools whose fetch raised are retried after this many seconds.
+COMPOSIO_TOOLS_ERROR_TTL = float(os.getenv("COMPOSIO_TOOLS_ERROR_TTL", "5"))
+COMPOSIO_STATUS_TTL = float(os.getenv("COMPOSIO_STATUS_TTL", "30"))
+# Past this age a cached status is not served even while a refresh runs.
+COMPOSIO_STATUS_MAX_STALE = float(os.getenv("COMPOSIO_STATUS_MAX_STALE", "600"))
+
+# Toolkit objects stringify like ItemToolkit(slug='GMAIL')
+_SLUG_RE = re.compile(r"SLUG=['\"]?([A-Z_]+)['\"]?")
+
+
+def _tool_name(schema) -> str | None:
+    """Slug of an OpenAI-format tool schema returned by composio.tools.get."""
+    if isinstance(schema, dict):
+        fn = schema.get("function") or {}
+        return fn.get("name") or schema.get("name")
+    fn = getattr(schema, "function", None)
+    return getattr(fn, "name", None) or getattr(schema, "name", None)
+
+
+class _UserTools:
+    __slots__ = ("schemas", "missing", "failed", "loaded_at")
+
+    def __init__(self):
+        self.schemas: dict[str, object] = {}
+        self.missing: set[str] = set()  # reported absent by Composio
+        self.failed: dict[str, float] = {}  # fetch raised -> retry after (monotonic)
+        self.loaded_at = time.monotonic()
+
+    def known(self, name: str, now: float) -> bool:
+        return name in self.schemas or name in self.missing or self.failed.get(name, 0) > now
+
+
+class ToolSchemaCache:
+    def __init__(self, ttl: float = COMPOSIO_TOOLS_TTL, error_ttl: float = COMPOSIO_TOOLS_ERROR_TTL):
+        self._ttl = ttl
+        self._error_ttl = error_ttl
+        self._lock = threading.Lock()
+        self._users: dict[str, _UserTools] = {}
+        self._toolkits: dict[str, frozenset] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, user_id: str, tools: list[str]) -> list:
+        """Schemas for the requested tools that this user has connected (unconnected ones are skipped)."""
+        if not get_composio_client():
+            return []  # not configured: nothing to cache
+        with self._lock:
+            entry = self._users.get(user_id)
+            now = time.monotonic()
+            if entry is not None and now - entry.loaded_at > self._ttl:
+                entry = None
+            unknown = [t for t in tools if entry is None or not entry.known(t, now)]
+            if not unknown:
+                self.hits += 1
+                return [entry.schemas[t] for t in tools if t in entry.schemas]
+            self.misses += 1
+
+        # Fetch outside the lock; a cold user gets the whole catalogue in one round-trip.
+        wanted = list(dict.fromkeys((ALL_COMPOSIO_TOOLS if entry is None else []) + unknown))
+        fetched, missing, failed = self._fetch(user_id, wanted)
+
+        with self._lock:
+            if entry is None:
+                entry = self._users[user_id] = _UserTools()
+            elif self._users.get(user_id) is not entry:
+                # Invalidated while we were fetching: answer this call but don't resurrect the entry.
+                schemas = {**entry.schemas, **fetched}
+                return [schemas[t] for t in tools if t in schemas]
+            entry.schemas.update(fetched)
+            entry.missing.update(missing)
+            retry_at = time.monotonic() + self._error_ttl
+            for name in fetched.keys() | missing:
+                entry.failed.pop(name, None)
+            for name in failed:
+                entry.failed[name] = retry_at
+            self.errors += 1 if failed else 0
+            return [entry.schemas[t] for t in tools if t in entry.schemas]
+
+    def _fetch(self, user_id: str, names: list[str]) -> tuple[dict, set, set]:
+        """(schemas, names Composio reported absent, names whose fetch raised)."""
+        composio = get_composio_client()
+        if not composio or not names:
+            return {}, set(), set(names)
+        try:
+            got = composio.tools.get(user_id=user_id, tools=names) or []
+            fetched = {n: s for s in got if (n := _tool_name(s))}
+            return fetched, {n for n in names if n not in fetched}, set()
+        except Exception as e:
+            # One unconnected toolkit can fail the whole batch; fall back to one call per tool.
+            logger.info(f"Composio batched tools fetch failed for {user_id} ({e}); fetching per tool")
+        fetched, missing, failed = {}, set(), set()
+        for name in names:
+            try:
+                got = composio.tools.get(user_id=user_id, tools=[name])
+            except Exception as e:
+                logger.info(f"Composio tool fetch failed for {user_id}/{name}: {e}")
+                failed.add(name)
+                continue
+            if got:
+                fetched[name] = got[0]
+            else:
+                missing.add(name)
+        return fetched, missing, failed
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def note_toolkits(self, user_id: str, toolkits):
+        """Record the user's active toolkit set; drop cached schemas when it changes."""
+        fingerprint = frozenset(toolkits)
+        with self._lock:
+            previous = self._toolkits.get(user_id)
+            self._toolkits[user_id] = fingerprint
+            if previous is not None and previous != fingerprint:
+                self._users.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "errors": self.errors, "users": len(self._users)}
+
+
+tool_cache = ToolSchemaCache()
+
+
+def execute_tool(user_id: str, slug: str, arguments: dict):
+    """Execute a Composio action directly (no LLM tool-call round trip).
+
+    Returns the Composio result, or None when Composio isn't configured or the
+    user hasn't connected the toolkit (checked against tool_cache). Raises when
+    Composio reports the execution as unsuccessful."""
+    composio = get_composio_client()
+    if not composio or not tool_cache.get(user_id, [slug]):
+        return None
+    result = composio.tools.execute(slug, arguments=arguments, user_id=user_id,
+                                    dangerously_skip_version_check=True)
+    if isinstance(result, dict) and result.get("successful") is False:
+        raise RuntimeError(result.get("error") or f"{slug} failed")
+    return result
+
+
+def clean_toolkit(t) -> str:
+    """Extract the toolkit slug from objects like ItemToolkit(slug='GMAIL')."""
+    s = str(t).upper().strip()
+    m = _SLUG_RE.search(s)
+    return m.group(1) if m else s
+
+
+def fetch_status(user_id: str) -> dict:
+    """Uncached connected-account status for one Composio user."""
+    composio = get_composio_client()
+    if not composio:
+        return {"connected": False, "reason": "Composio not configured"}
+    accounts = composio.connected_accounts.list(user_ids=[user_id])
+    active = [a for a in accounts.items if str(a.status).upper() == "ACTIVE"]
+    toolkits = list(set(clean_toolkit(a.toolkit) for a in active if a.toolkit))
+    tool_cache.note_toolkits(user_id, toolkits)
+    return {
+        "connected": len(active) > 0,
+        "active_count": len(active),
+        "toolkits": toolkits,
+    }
+
+
+class StatusCache:
+    def __init__(self, ttl: float = COMPOSIO_STATUS_TTL, max_stale: float = COMPOSIO_STATUS_MAX_STALE):
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._lock = threading.Lock()
+        self._entries: dict[str, tuple[dict, float]] = {}
+        self._refreshing: set[str] = set()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="composio-status")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.forced = 0
+
+    def get(self, user_id: str, refresh: bool = False) -> dict:
+        """Cached status; refresh=True skips the cache and fetches now (explicit user refresh)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = None if refresh else self._entries.get(user_id)
+            if entry is not None:
+                status, fetched_at = entry
+                age = now - fetched_at
+                if age <= self._ttl:
+                    self.hits += 1
+                    return status
+                if age <= self._max_stale:
+                    self.stale_hits += 1
+                    if user_id not in self._refreshing:
+                        self._refreshing.add(user_id)
+                        self._pool.submit(self._refresh, user_id)
+                    return status
+            if refresh:
+                self.forced += 1
+            else:
+                self.misses += 1
+        try:
+            return self._store(user_id, fetch_status(user_id))
+        except Exception as e:
+            return {"connected": False, "reason": str(e)}
+
+    def _refresh(self, user_id: str):
+        try:
+            self._store(user_id, fetch_status(user_id))
+        except Exception as e:
+            logger.info(f"Composio status refresh failed for {user_id}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
+
+    def _store(self, user_id: str, status: dict) -> dict:
+        with self._lock:
+            self._entries[user_id] = (status, time.monotonic())
+        return status
+
+    def invalidate(self, user_id: str):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "stale_hits": self.stale_hits, "misses": self.misses,
+                    "forced": self.forced, "users": len(self._entries)}
+
+
+status_cache = StatusCache()
+
+
+class AuthConfigIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_toolkit: dict[str, object] = {}
+        self.loads = 0
+        self.creates = 0
+
+    def load(self):
+        """(Re)build the index from composio.auth_configs.list()."""
+        composio = get_composio_client()
+        if not composio:
+            return
+        configs = composio.auth_configs.list()
+        index = {}
+        for ac in configs.items:
+            toolkit = clean_toolkit(ac.toolkit) if ac.toolkit else ""
+            if toolkit:
+                index.setdefault(toolkit, ac)  # first match wins, as the old linear scan did
+        with self._lock:
+            self._by_toolkit = index
+            self.loads += 1
+
+    def get_or_create(self, composio, toolkit: str):
+        toolkit = toolkit.upper().strip()
+        config = self._by_toolkit.get(toolkit)
+        if config is not None:
+            return config
+        # Miss: it may have been created elsewhere since we loaded — reload once, then create.
+        self.load()
+        config = self._by_toolkit.get(toolkit)
+        if config is None:
+            # Create with Composio managed auth
+            config = composio.auth_configs.create(
+                toolkit=toolkit,
+                options={"type": "use_composio_managed_auth"},
+            )
+            with self._lock:
+                self._by_toolkit[toolkit] = config
+                self.creates += 1
+        return config
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"toolkits": len(self._by_toolkit), "loads": self.loads, "creates": self.creates}
+
+
+auth_config_index = AuthConfigIndex()
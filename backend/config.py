@@ -2,7 +2,7 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import plivo
 
 load_dotenv(dotenv_path=Path(__file__).with_name(".env"))
@@ -18,11 +18,23 @@ def make_client(key: str | None) -> OpenAI:
     return OpenAI(api_key=key)
 
 
+def make_async_client(key: str | None) -> AsyncOpenAI:
+    if not key:
+        raise RuntimeError("Missing OpenAI API key")
+    return AsyncOpenAI(api_key=key)
+
+
 CLIENTS = {
     "sean": make_client(SEAN_KEY),
     "yug": make_client(YUG_KEY),
 }
 
+# Same keys, async transport — used by async handlers so LLM calls don't pin threadpool workers.
+ASYNC_CLIENTS = {
+    "sean": make_async_client(SEAN_KEY),
+    "yug": make_async_client(YUG_KEY),
+}
+
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
 
 # --- AGI (web research via REST API) ---
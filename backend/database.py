@@ -1,15 +1,254 @@
 import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from loguru import logger
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./parallel.db")
 
-# SQLite needs check_same_thread disabled for multi-threaded FastAPI dev server
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(DATABASE_URL, echo=False, future=True, connect_args=connect_args)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+def _async_url(url: str) -> str:
+    """Map the sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)."""
+    scheme, sep, rest = url.partition("://")
+    if scheme.startswith("sqlite"):
+        return f"sqlite+aiosqlite{sep}{rest}"
+    if scheme.startswith("postgresql") or scheme.startswith("postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# ───────────────────────── engine profile (env) ─────────────────────────
+
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Server-side statement timeout (Postgres); 0 disables.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# How long SQLite waits on a locked database before raising.
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Apply pending migrations at boot. Default: on for SQLite (dev), off elsewhere —
+# production runs `python migrate.py` as a deploy step (indexes build CONCURRENTLY).
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", str(DATABASE_URL.startswith("sqlite"))).lower() == "true"
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+# Revision matching the schema that Base.metadata.create_all produced before migrations existed.
+BASELINE_REVISION = "0001"
+
+
+# ───────────────────────── pool checkout metrics ─────────────────────────
+
+_pool_lock = threading.Lock()
+_pool_stats: dict[str, dict] = {}
+_pools: dict[str, object] = {}
+
+
+def _record_checkout(name: str, wait: float, timed_out: bool):
+    with _pool_lock:
+        s = _pool_stats.setdefault(name, {"checkouts": 0, "timeouts": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0})
+        s["checkouts"] += 0 if timed_out else 1
+        s["timeouts"] += 1 if timed_out else 0
+        s["total_wait_ms"] += wait * 1000
+        s["max_wait_ms"] = max(s["max_wait_ms"], wait * 1000)
+
+
+class _TimedPoolMixin:
+    """Times how long callers wait for a pooled connection (pool exhaustion shows up here)."""
+    stats_name = "db"
+
+    def _do_get(self):
+        _pools[self.stats_name] = self
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            _record_checkout(self.stats_name, time.perf_counter() - started, True)
+            raise
+        _record_checkout(self.stats_name, time.perf_counter() - started, False)
+        return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    stats_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats_name = "async"
+
+
+def pool_stats() -> dict:
+    """Checkout wait times and current occupancy per engine, for /metrics."""
+    with _pool_lock:
+        out = {}
+        for name, s in _pool_stats.items():
+            pool = _pools.get(name)
+            out[name] = {
+                "checkouts": s["checkouts"],
+                "timeouts": s["timeouts"],
+                "avg_wait_ms": round(s["total_wait_ms"] / max(1, s["checkouts"] + s["timeouts"]), 2),
+                "max_wait_ms": round(s["max_wait_ms"], 2),
+                "checked_out": pool.checkedout() if pool is not None else None,
+                "overflow": pool.overflow() if pool is not None else None,
+            }
+        return out
+
+
+# ───────────────────────── engine factory ─────────────────────────
+
+def _sqlite_pragmas(dbapi_conn, _record):
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cur.close()
+
+
+def make_engine(url: str, *, is_async: bool = False):
+    """Engine with the pool/timeout profile from env, for SQLite (dev) and Postgres (prod)."""
+    sqlite = url.startswith("sqlite")
+    kwargs: dict = {"echo": DB_ECHO, "pool_pre_ping": DB_POOL_PRE_PING}
+    connect_args: dict = {}
+
+    in_memory = sqlite and (":memory:" in url or url.rstrip("/").endswith("sqlite:") or "mode=memory" in url)
+    if not in_memory:
+        kwargs.update(
+            poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+
+    if sqlite:
+        if not is_async:
+            # SQLite needs check_same_thread disabled for multi-threaded FastAPI dev server
+            connect_args["check_same_thread"] = False
+    elif DB_STATEMENT_TIMEOUT_MS and url.startswith("postgres"):
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        else:
+            connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
+    if is_async:
+        eng = create_async_engine(url, connect_args=connect_args, **kwargs)
+        sync_eng = eng.sync_engine
+    else:
+        eng = sync_eng = create_engine(url, future=True, connect_args=connect_args, **kwargs)
+    if sqlite and not in_memory:
+        event.listen(sync_eng, "connect", _sqlite_pragmas)
+    return eng
+
+
+class AppSession(Session):
+    """Session class shared by the sync and async factories so ORM event hooks apply to both."""
+
+
+engine = make_engine(DATABASE_URL)
+SessionLocal = sessionmaker(bind=engine, class_=AppSession, autoflush=False, autocommit=False, future=True)
+
+# Async engine for handlers that await remote calls (LLMs) — no threadpool worker is pinned.
+async_engine = make_engine(ASYNC_DATABASE_URL, is_async=True)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, sync_session_class=AppSession, autoflush=False, expire_on_commit=False,
+)
 
 Base = declarative_base()
+
+
+# ───────────────────────── unit of work ─────────────────────────
+# Request pipelines that call LLMs / remote APIs are split into: a short unit of
+# work (read what the remote call needs, stage inputs), the remote work with no
+# session open, then another short unit of work for the results. Never hold one
+# across an await on a remote service — that is what drains the pool.
+
+@contextmanager
+def unit_of_work():
+    """Short sync transaction: commit on success, roll back on error, always close (connection back to the pool)."""
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def aunit_of_work():
+    """Async counterpart of unit_of_work(). Loaded objects stay readable after it closes (expire_on_commit=False)."""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+
+
+# ───────────────────────── schema version ─────────────────────────
+
+def alembic_config():
+    from alembic.config import Config
+    cfg = Config(ALEMBIC_INI)
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+def migrate_to_head():
+    """`alembic upgrade head`, stamping pre-migration (create_all) databases with the baseline first."""
+    from alembic import command
+    cfg = alembic_config()
+    with engine.connect() as conn:
+        unversioned = _current_revision(conn) is None and inspect(conn).has_table("users")
+    if unversioned:
+        logger.info(f"Existing schema without a version: stamping baseline {BASELINE_REVISION}")
+        command.stamp(cfg, BASELINE_REVISION)
+    command.upgrade(cfg, "head")
+
+
+def reset_schema():
+    """Drop every table (including the version table) and rebuild through the migrations."""
+    Base.metadata.drop_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+    migrate_to_head()
+
+
+def _current_revision(conn) -> str | None:
+    from alembic.runtime.migration import MigrationContext
+    return MigrationContext.configure(conn).get_current_revision()
+
+
+def check_schema_version():
+    """Boot-time check: one read of alembic_version against the head revision in migrations/.
+
+    Applies pending migrations when DB_AUTO_MIGRATE is on; otherwise refuses to start
+    on a mismatch rather than running against a schema the code doesn't expect."""
+    from alembic.script import ScriptDirectory
+    head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    with engine.connect() as conn:
+        current = _current_revision(conn)
+    if current == head:
+        logger.info(f"Database schema at {current}")
+        return
+    if DB_AUTO_MIGRATE:
+        logger.info(f"Database schema at {current}, migrating to {head}")
+        migrate_to_head()
+        return
+    raise RuntimeError(
+        f"Database schema is at revision {current}, code expects {head}. "
+        f"Run `python migrate.py` in backend/ (stamps a database created before migrations "
+        f"at {BASELINE_REVISION}, then upgrades), or set DB_AUTO_MIGRATE=true."
+    )
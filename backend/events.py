@@ -0,0 +1,155 @@
+"""
+In-process fan-out hub that pushes new Message / Activity rows to open dashboards.
+
+Rows are captured from any AppSession (sync or async) on flush and published
+only once the transaction commits, so chat, SMS and voice paths all feed the
+same stream without each call site having to remember to publish.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+from loguru import logger
+from sqlalchemy import event
+
+from database import AppSession
+from models import Message as MessageORM, Activity as ActivityORM
+
+QUEUE_SIZE = 256
+HEARTBEAT_SECONDS = 15
+
+MESSAGE_FIELDS = ("id", "sender_id", "sender_name", "role", "content", "created_at")
+ACTIVITY_FIELDS = ("id", "user_id", "user_name", "summary", "created_at")
+
+
+def _snapshot(obj, fields) -> dict:
+    out = {}
+    for f in fields:
+        v = getattr(obj, f)
+        out[f] = v.isoformat() if isinstance(v, datetime) else v
+    return out
+
+
+class Subscriber:
+    """One open dashboard connection: a bounded queue bound to the loop that reads it."""
+
+    __slots__ = ("user_id", "loop", "queue", "dropped")
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.dropped = 0
+
+    def _offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Slow client: drop the event; the dashboard resyncs on its next reconnect.
+            self.dropped += 1
+
+
+class EventHub:
+    """Thread-safe publish / subscribe. Publishers may run on any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: set[Subscriber] = set()
+        self._listeners = []
+        self.published = 0
+
+    def add_listener(self, fn):
+        """Register an in-process callback `fn(kind, data, user_id)` run synchronously on publish."""
+        self._listeners.append(fn)
+
+    def subscribe(self, user_id: str) -> Subscriber:
+        sub = Subscriber(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber):
+        with self._lock:
+            self._subs.discard(sub)
+
+    def publish(self, kind: str, data: dict, user_id: str | None = None):
+        """Deliver to every subscriber, or only to `user_id`'s subscribers when given."""
+        with self._lock:
+            targets = [s for s in self._subs if user_id is None or s.user_id == user_id]
+        self.published += 1
+        for fn in self._listeners:
+            try:
+                fn(kind, data, user_id)
+            except Exception as e:
+                logger.warning(f"Event listener {getattr(fn, '__qualname__', fn)} failed: {e}")
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, (kind, data))
+            except RuntimeError:
+                # Loop already closed (server shutting down) — forget the subscriber.
+                self.unsubscribe(sub)
+
+    def connected_user_ids(self) -> set[str]:
+        with self._lock:
+            return {s.user_id for s in self._subs}
+
+    def stats(self) -> dict:
+        with self._lock:
+            subs = list(self._subs)
+        return {
+            "subscribers": len(subs),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subs),
+        }
+
+
+hub = EventHub()
+
+
+async def sse_stream(user_id: str):
+    """Yield Server-Sent Events for `user_id` until the client disconnects.
+
+    Subscribes on the first step, so a client gone before the stream starts never registers."""
+    sub = hub.subscribe(user_id)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                kind, data = await asyncio.wait_for(sub.queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {kind}\ndata: {json.dumps(data)}\n\n"
+    finally:
+        hub.unsubscribe(sub)
+
+
+# ─── Session hooks: capture on flush, publish on commit ──────
+
+@event.listens_for(AppSession, "after_flush")
+def _collect_new_rows(session, flush_context):
+    pending = session.info.setdefault("hub_pending", [])
+    for obj in session.new:
+        if isinstance(obj, MessageORM):
+            pending.append(("message", _snapshot(obj, MESSAGE_FIELDS), obj.user_id))
+        elif isinstance(obj, ActivityORM):
+            pending.append(("activity", _snapshot(obj, ACTIVITY_FIELDS), None))
+
+
+@event.listens_for(AppSession, "after_commit")
+def _publish_committed(session):
+    pending = session.info.pop("hub_pending", None)
+    if not pending:
+        return
+    for kind, data, user_id in pending:
+        try:
+            hub.publish(kind, data, user_id=user_id)
+        except Exception as e:
+            logger.warning(f"Event publish failed: {e}")
+
+
+@event.listens_for(AppSession, "after_rollback")
+def _discard_rolled_back(session):
+    session.info.pop("hub_pending", None)
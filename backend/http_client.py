@@ -0,0 +1,196 @@
+"""
+Shared outbound HTTP layer (AGI, Plivo REST, recording downloads).
+
+One pooled keep-alive client per mode (sync for worker threads, async for the
+event loop), HTTP/2 when the `h2` package is installed, a per-host cap on
+concurrent requests, retry with exponential backoff for transient failures,
+and per-host latency counters for /metrics.
+"""
+
+import asyncio
+import importlib.util
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from loguru import logger
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "10"))
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+DEFAULT_RETRIES = 2
+BACKOFF_BASE = 0.5
+
+RETRY_STATUSES = {429, 502, 503, 504}
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "DELETE", "PUT"}
+
+_limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE)
+_lock = threading.Lock()
+_sync_client: httpx.Client | None = None
+_async_client: httpx.AsyncClient | None = None
+_sync_slots: dict[str, threading.Semaphore] = {}
+_async_slots: dict[str, asyncio.Semaphore] = {}
+_stats: dict[str, dict] = {}
+
+
+def _client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(http2=HTTP2, limits=_limits, timeout=DEFAULT_TIMEOUT,
+                                            follow_redirects=True)
+    return _sync_client
+
+
+def _aclient() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(http2=HTTP2, limits=_limits, timeout=DEFAULT_TIMEOUT,
+                                          follow_redirects=True)
+    return _async_client
+
+
+def _record(host: str, started: float, ok: bool, retried: bool):
+    ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        s = _stats.setdefault(host, {"requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0})
+        s["requests"] += 1
+        s["errors"] += 0 if ok else 1
+        s["retries"] += 1 if retried else 0
+        s["total_ms"] += ms
+        s["max_ms"] = max(s["max_ms"], ms)
+
+
+def _should_retry(method: str, attempt: int, retries: int, resp=None, exc=None) -> bool:
+    if attempt >= retries:
+        return False
+    if exc is not None:
+        # A connect failure means the request never left; safe to resend for any method.
+        return isinstance(exc, httpx.ConnectError) or (method in IDEMPOTENT and isinstance(exc, httpx.TransportError))
+    return method in IDEMPOTENT and resp.status_code in RETRY_STATUSES
+
+
+def _backoff(attempt: int) -> float:
+    return BACKOFF_BASE * (2 ** attempt) * (0.5 + random.random())
+
+
+def request(method: str, url: str, *, retries: int = DEFAULT_RETRIES, **kwargs) -> httpx.Response:
+    """Blocking request on the shared pool (for worker threads)."""
+    method = method.upper()
+    host = urlsplit(url).netloc
+    with _lock:
+        slot = _sync_slots.setdefault(host, threading.Semaphore(PER_HOST_LIMIT))
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            with slot:
+                resp = _client().request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            _record(host, started, False, attempt > 0)
+            if not _should_retry(method, attempt, retries, exc=e):
+                raise
+            logger.info(f"HTTP {method} {host} failed ({e!r}), retrying")
+        else:
+            _record(host, started, resp.status_code < 500, attempt > 0)
+            if not _should_retry(method, attempt, retries, resp=resp):
+                return resp
+            logger.info(f"HTTP {method} {host} -> {resp.status_code}, retrying")
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+
+def download(url: str, dest, *, retries: int = DEFAULT_RETRIES, chunk_size: int = 64 * 1024, **kwargs) -> int:
+    """Stream a GET body into the open binary file `dest` without buffering it in memory.
+
+    Raises httpx.HTTPStatusError on a non-2xx final response. Returns bytes written."""
+    host = urlsplit(url).netloc
+    with _lock:
+        slot = _sync_slots.setdefault(host, threading.Semaphore(PER_HOST_LIMIT))
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            with slot, _client().stream("GET", url, **kwargs) as resp:
+                if _should_retry("GET", attempt, retries, resp=resp):
+                    _record(host, started, resp.status_code < 500, attempt > 0)
+                    logger.info(f"HTTP GET {host} -> {resp.status_code}, retrying")
+                else:
+                    resp.raise_for_status()
+                    dest.seek(0)
+                    dest.truncate()
+                    written = 0
+                    for chunk in resp.iter_bytes(chunk_size):
+                        dest.write(chunk)
+                        written += len(chunk)
+                    dest.flush()
+                    _record(host, started, True, attempt > 0)
+                    return written
+        except httpx.TransportError as e:
+            _record(host, started, False, attempt > 0)
+            if not _should_retry("GET", attempt, retries, exc=e):
+                raise
+            logger.info(f"HTTP GET {host} failed ({e!r}), retrying")
+        except httpx.HTTPStatusError as e:
+            _record(host, started, e.response.status_code < 500, attempt > 0)
+            raise
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+
+async def arequest(method: str, url: str, *, retries: int = DEFAULT_RETRIES, **kwargs) -> httpx.Response:
+    """Async request on the shared pool (for the event loop)."""
+    method = method.upper()
+    host = urlsplit(url).netloc
+    slot = _async_slots.get(host)
+    if slot is None:
+        slot = _async_slots[host] = asyncio.Semaphore(PER_HOST_LIMIT)
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            async with slot:
+                resp = await _aclient().request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            _record(host, started, False, attempt > 0)
+            if not _should_retry(method, attempt, retries, exc=e):
+                raise
+            logger.info(f"HTTP {method} {host} failed ({e!r}), retrying")
+        else:
+            _record(host, started, resp.status_code < 500, attempt > 0)
+            if not _should_retry(method, attempt, retries, resp=resp):
+                return resp
+            logger.info(f"HTTP {method} {host} -> {resp.status_code}, retrying")
+        await asyncio.sleep(_backoff(attempt))
+        attempt += 1
+
+
+async def aclose():
+    """Close both pools (app shutdown)."""
+    global _sync_client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            host: {
+                "requests": s["requests"],
+                "errors": s["errors"],
+                "retries": s["retries"],
+                "avg_ms": round(s["total_ms"] / s["requests"], 1) if s["requests"] else None,
+                "max_ms": round(s["max_ms"], 1),
+            }
+            for host, s in _stats.items()
+        }
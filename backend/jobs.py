@@ -0,0 +1,97 @@
+"""
+Background job manager for slow remote workflows (AGI research, summaries,
+call transcription).
+
+Jobs run as asyncio tasks on the server's event loop with a concurrency cap
+per job kind, so long-running work never holds a request worker or an HTTP
+connection. Status is kept in memory for GET /jobs/{id}; results that users
+need to see are delivered by the job itself (e.g. as a new Message).
+"""
+
+import asyncio
+import os
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from loguru import logger
+
+DEFAULT_LIMIT = 4
+KEEP_FINISHED = 500
+
+
+class JobManager:
+    def __init__(self, limits: dict[str, int] | None = None, keep: int = KEEP_FINISHED):
+        self._limits = limits or {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._jobs: OrderedDict[str, dict] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+        self._keep = keep
+
+    def submit(self, kind: str, fn, *args, user_id: str | None = None, **kwargs) -> str:
+        """Schedule `await fn(job_id, *args, **kwargs)` on the running loop. Returns the job id."""
+        job_id = str(uuid.uuid4())
+        self._jobs[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "status": "queued",
+            "user_id": user_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+        task = asyncio.get_running_loop().create_task(self._run(job_id, kind, fn, args, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        self._prune()
+        return job_id
+
+    async def _run(self, job_id, kind, fn, args, kwargs):
+        job = self._jobs[job_id]
+        sem = self._semaphores.get(kind)
+        if sem is None:
+            sem = self._semaphores[kind] = asyncio.Semaphore(self._limits.get(kind, DEFAULT_LIMIT))
+        async with sem:
+            job["status"] = "running"
+            job["started_at"] = datetime.now(timezone.utc).isoformat()
+            try:
+                job["result"] = await fn(job_id, *args, **kwargs)
+                job["status"] = "done"
+            except Exception as e:
+                traceback.print_exc()
+                logger.error(f"Job {kind}/{job_id} failed: {e}")
+                job["status"] = "error"
+                job["error"] = str(e)[:500]
+            finally:
+                job["finished_at"] = datetime.now(timezone.utc).isoformat()
+
+    def update(self, job_id: str, **fields):
+        """Let a running job publish progress (e.g. current step) for status polling."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.update(fields)
+
+    def get(self, job_id: str) -> dict | None:
+        return self._jobs.get(job_id)
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j["status"] in ("done", "error")]
+        for job in finished[: max(0, len(finished) - self._keep)]:
+            self._jobs.pop(job["id"], None)
+
+    def stats(self) -> dict:
+        by_status: dict[str, int] = {}
+        for job in self._jobs.values():
+            key = f"{job['kind']}:{job['status']}"
+            by_status[key] = by_status.get(key, 0) + 1
+        return {"in_flight": len(self._tasks), "jobs": by_status}
+
+
+jobs = JobManager(limits={
+    "research": int(os.getenv("AGI_MAX_CONCURRENT", "4")),
+    "summary": int(os.getenv("SUMMARY_MAX_CONCURRENT", "2")),
+    "transcription": int(os.getenv("TRANSCRIBE_MAX_CONCURRENT", "2")),
+})
@@ -5,30 +5,50 @@ Includes real-time Pipecat voice agent via Gemini Live.
 
 import os
 import uuid
+import asyncio
+import threading
 import time
+import base64
+import json
+import re
 import traceback
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-import requests as http_requests
 from fastapi import FastAPI, Request, Response, Depends, HTTPException, Form, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from jose import jwt, JWTError
 import bcrypt
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+import anyio
+from starlette.concurrency import run_in_threadpool
 from loguru import logger
 
-from database import SessionLocal, engine, Base
+from database import SessionLocal, pool_stats, unit_of_work, aunit_of_work, check_schema_version
 from models import (
     User as UserORM,
     UserCredential as UserCredentialORM,
     Message as MessageORM,
     Activity as ActivityORM,
+    ArchivedDay as ArchivedDayORM,
 )
+from events import hub, sse_stream
+from team_context import team_context
+from jobs import jobs
+from composio_cache import ALL_COMPOSIO_TOOLS, tool_cache, status_cache, auth_config_index, execute_tool
+from research_cache import research_cache
+from summaries import summarizer
+import archive
+from archive import archiver
+from transcription import download_to_tempfile, transcribe_file, recordings
+import http_client
+from prompting import prompt_stats
 from config import (
-    CLIENTS, OPENAI_MODEL,
+    CLIENTS, ASYNC_CLIENTS, OPENAI_MODEL,
     AGI_API_KEY, AGI_BASE_URL,
     COMPOSIO_API_KEY, get_composio_client,
     PLIVO_AUTH_ID, PLIVO_AUTH_TOKEN, PLIVO_PHONE_NUMBER, PLIVO_CLIENT,
@@ -48,12 +68,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Prev-Cursor"],
 )
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    await http_client.aclose()
+
+
 @app.on_event("startup")
 def on_startup():
-    Base.metadata.create_all(bind=engine)
+    # Schema changes ship as Alembic migrations (backend/migrations); boot only compares versions.
+    check_schema_version()
+    # Warm the Composio auth-config index off the boot path (best effort)
+    if COMPOSIO_API_KEY:
+        threading.Thread(target=_load_auth_configs, daemon=True).start()
+    # Official Spoon OS mode: compile every TeamGraph entry point before the first request
+    if os.getenv("SPOON_IMPL") == "official":
+        _warm_team_graphs()
+
+
+@app.on_event("startup")
+async def start_background_loops():
+    # Retention: move messages past MESSAGE_RETENTION_DAYS to the archive tier
+    if archiver.retention_days > 0:
+        app.state.archive_task = asyncio.get_running_loop().create_task(archiver.run_forever())
+
+
+def _warm_team_graphs():
+    try:
+        from spoon_official import warm_team_graphs
+        warm_team_graphs()
+        logger.info("Team graphs compiled")
+    except Exception as e:
+        logger.warning(f"Team graph warm-up failed: {e}")
+
+
+def _load_auth_configs():
+    try:
+        auth_config_index.load()
+    except Exception as e:
+        logger.warning(f"Composio auth-config preload failed: {e}")
 
 
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret")
@@ -107,17 +163,43 @@ def require_user(request: Request, db: Session) -> UserORM:
     return user
 
 
+async def require_user_async(request: Request, db: AsyncSession) -> UserORM:
+    token = request.cookies.get("access_token")
+    if token:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user = await db.get(UserORM, payload.get("sub"))
+            if user:
+                return user
+        except JWTError:
+            pass
+    raise HTTPException(401, "Not authenticated")
+
+
 def touch(db: Session, user: UserORM):
     user.last_seen_at = datetime.now(timezone.utc)
     db.add(user)
     db.commit()
 
 
-def _client_for_user(user: UserORM):
-    name = (user.name or "").strip().lower()
+def _client_for_name(name: str | None):
+    name = (name or "").strip().lower()
     return CLIENTS.get(name) or CLIENTS.get("sean") or next(iter(CLIENTS.values()), None)
 
 
+def _async_client_for_name(name: str | None):
+    name = (name or "").strip().lower()
+    return ASYNC_CLIENTS.get(name) or ASYNC_CLIENTS.get("sean") or next(iter(ASYNC_CLIENTS.values()), None)
+
+
+def _client_for_user(user: UserORM):
+    return _client_for_name(user.name)
+
+
+def _async_client_for_user(user: UserORM):
+    return _async_client_for_name(user.name)
+
+
 def _save_msg(db, user_id, sender_id, sender_name, role, content):
     msg = MessageORM(
         id=str(uuid.uuid4()), user_id=user_id, sender_id=sender_id,
@@ -135,11 +217,11 @@ def _save_activity(db, user_id, user_name, summary):
     ))
 
 
-def _build_system_prompt(db: Session, user: UserORM) -> str:
-    activities = db.query(ActivityORM).order_by(ActivityORM.created_at.desc()).limit(15).all()
-    activity_text = "\n".join(f"- {a.user_name}: {a.summary}" for a in reversed(activities)) or "(none)"
-    messages = db.query(MessageORM).order_by(MessageORM.created_at.asc()).limit(30).all()
-    history = "\n".join(f"{m.sender_name}: {m.content[:300]}" for m in messages) or "(none)"
+async def _build_system_prompt_async(db: AsyncSession, user: UserORM) -> str:
+    return _render_system_prompt(user, *(await team_context.asections(db)))
+
+
+def _render_system_prompt(user: UserORM, activity_text: str, history: str) -> str:
     return f"""You are {user.name}'s personal AI assistant in a team workspace.
 
 == TEAM ACTIVITY ==
@@ -232,15 +314,64 @@ def online(request: Request, db: Session = Depends(get_db)):
     members = []
     # Return all users (Sean, Yug, etc.) so team roster and online status are visible
     users = db.query(UserORM).order_by(UserORM.name).all()
+    streaming = hub.connected_user_ids()
     for u in users:
         last = u.last_seen_at or u.created_at
         if last and last.tzinfo is None:
             last = last.replace(tzinfo=timezone.utc)
         delta = (now - last).total_seconds() if last else 9999
-        members.append({"id": u.id, "name": u.name or "Unknown", "online": delta <= ONLINE_SECONDS})
+        members.append({"id": u.id, "name": u.name or "Unknown",
+                        "online": delta <= ONLINE_SECONDS or u.id in streaming})
     return {"members": members}
 
 
+# ───────────────────────── live events ─────────────────────────
+
+@app.get("/events")
+async def event_stream(request: Request):
+    """Server-Sent Events: pushes the caller's new messages and all team activity as they are committed."""
+    async with aunit_of_work() as db:
+        user = await require_user_async(request, db)
+        user.last_seen_at = datetime.now(timezone.utc)
+        user_id = user.id
+    return StreamingResponse(
+        sse_stream(user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+def metrics(request: Request, db: Session = Depends(get_db)):
+    """In-process counters for monitoring (event fan-out, prompt-context cache)."""
+    require_user(request, db)
+    return {
+        "events": hub.stats(),
+        "team_context": team_context.stats(),
+        "prompts": prompt_stats.stats(),
+        "jobs": jobs.stats(),
+        "http": http_client.stats(),
+        "research_cache": research_cache.stats(),
+        "composio_tools": tool_cache.stats(),
+        "composio_status": status_cache.stats(),
+        "composio_auth_configs": auth_config_index.stats(),
+        "summaries": summarizer.stats(),
+        "recordings": recordings.stats(),
+        "db_pool": pool_stats(),
+        "archive": archiver.stats(),
+    }
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Status of a background job (research, summary) started by the current user."""
+    user = require_user(request, db)
+    job = jobs.get(job_id)
+    if not job or job["user_id"] != user.id:
+        raise HTTPException(404, "Job not found")
+    return job
+
+
 # ───────────────────────── chat ─────────────────────────
 
 class ChatRequest(BaseModel):
@@ -261,50 +392,149 @@ class MessageOut(BaseModel):
 
 
 @app.post("/chat", response_model=MessageOut)
-def chat(payload: ChatRequest, request: Request, db: Session = Depends(get_db)):
-    user = require_user(request, db)
-    touch(db, user)
+async def chat(payload: ChatRequest, request: Request):
+    """Async chat as short read -> remote work -> short write; no DB connection is held
+    while the LLM / AGI / Composio call runs, so slow turns can't drain the pool."""
+    mode = payload.mode or "chat"
     content = (payload.content or "").strip()
-    if not content:
-        raise HTTPException(400, "Empty message")
 
-    # Save user message
-    _save_msg(db, user.id, f"user:{user.id}", user.name, "user", content)
-    db.commit()
+    # Short read/write: auth, presence, the user's message, and the prompt the LLM needs
+    async with aunit_of_work() as db:
+        user = await require_user_async(request, db)
+        if not content:
+            raise HTTPException(400, "Empty message")
+        user.last_seen_at = datetime.now(timezone.utc)
+        _save_msg(db, user.id, f"user:{user.id}", user.name, "user", content)
+        prompt = await _build_system_prompt_async(db, user) if mode == "chat" else None
+
+    answer, tag = await _answer_for_mode(user, content, mode, payload.action_tool, prompt)
+
+    async with aunit_of_work() as db:
+        bot_msg = _save_reply(db, user, content, mode, tag + answer)
+    return bot_msg
 
-    mode = payload.mode or "chat"
 
+async def _answer_for_mode(user, content: str, mode: str, action_tool: str | None, prompt: str | None = None):
+    """Run the non-streaming answer for a chat mode (no session held). Returns (answer, tag)."""
     # ── RESEARCH MODE (AGI REST API) ──
     if mode == "research":
-        answer = _do_agi_research(content, user)
-        tag = "[AGI Research] "
+        cached = await research_cache.lookup(content)
+        if cached is not None:
+            return cached, "[AGI Research] (cached) "
+        return _start_research_job(content, user), "[AGI Research] "
     # ── ACTION MODE (Composio) ──
-    elif mode == "action":
-        answer = _do_composio_action(user, content, tool_name=payload.action_tool, db=db)
-        tag = "[Composio Action] "
+    if mode == "action":
+        return await run_in_threadpool(_do_composio_action_with_session, user, content, action_tool), "[Composio Action] "
     # ── NORMAL CHAT ──
-    else:
-        answer = _do_chat(db, user, content)
-        tag = ""
+    return await _do_chat_async(user, content, prompt), ""
 
-    bot_msg = _save_msg(db, user.id, f"agent:{user.id}", f"{user.name}'s Agent",
-                        "assistant", tag + answer)
+
+def _save_reply(db, user, content: str, mode: str, answer: str):
+    """Stage the agent reply plus the one-line activity entry for a chat turn."""
+    bot_msg = _save_msg(db, user.id, f"agent:{user.id}", f"{user.name}'s Agent", "assistant", answer)
     _save_activity(db, user.id, user.name,
                    (f"[{mode}] " if mode != "chat" else "") + content[:70] + ("..." if len(content) > 70 else ""))
-    db.commit()
-    db.refresh(bot_msg)
     return bot_msg
 
 
-def _do_chat(db, user, content):
-    client = _client_for_user(user)
+@app.post("/chat/stream")
+async def chat_stream(payload: ChatRequest, request: Request):
+    """
+    Streaming /chat. Responds with NDJSON, one event per line:
+      {"type": "start", "user_message_id": ...}
+      {"type": "token", "delta": "..."}                       (chat mode: as tokens arrive)
+      {"type": "done", "message": MessageOut, "ttft_ms": ..., "total_ms": ...}
+      {"type": "error", "error": "..."}
+    The assembled assistant message is persisted once, at the end.
+    Research/action modes cannot stream and send their whole answer as a single token.
+    """
+    started = time.perf_counter()
+    mode = payload.mode or "chat"
+    content = (payload.content or "").strip()
+    async with aunit_of_work() as db:
+        user = await require_user_async(request, db)
+        if not content:
+            raise HTTPException(400, "Empty message")
+        user.last_seen_at = datetime.now(timezone.utc)
+        user_msg = _save_msg(db, user.id, f"user:{user.id}", user.name, "user", content)
+
+    async def events():
+        parts: list[str] = []
+        ttft_ms = None
+        done = False
+        yield json.dumps({"type": "start", "user_message_id": user_msg.id}) + "\n"
+        try:
+            if mode == "chat":
+                deltas = _stream_chat_async(user, content)
+            else:
+                async def _whole():
+                    answer, _tag = await _answer_for_mode(user, content, mode, payload.action_tool)
+                    yield _tag + answer
+                deltas = _whole()
+            async for delta in deltas:
+                if ttft_ms is None:
+                    ttft_ms = round((time.perf_counter() - started) * 1000)
+                parts.append(delta)
+                yield json.dumps({"type": "token", "delta": delta}) + "\n"
+            done = True
+        except Exception as e:
+            logger.warning(f"/chat/stream error for {user.name}: {e}")
+            yield json.dumps({"type": "error", "error": str(e)[:300]}) + "\n"
+            parts.append(f"{' ' if parts else ''}[stream interrupted: {str(e)[:200]}]")
+        finally:
+            # Persist even if the client went away mid-stream; shield the write from cancellation.
+            answer = "".join(parts).strip() or "No response."
+            with anyio.CancelScope(shield=True):
+                async with aunit_of_work() as wdb:
+                    bot_msg = _save_reply(wdb, user, content, mode, answer)
+            total_ms = round((time.perf_counter() - started) * 1000)
+            logger.info(f"/chat/stream {user.name} mode={mode} ttft_ms={ttft_ms} total_ms={total_ms}")
+        if done:
+            out = MessageOut.model_validate(bot_msg).model_dump(mode="json")
+            yield json.dumps({"type": "done", "message": out, "ttft_ms": ttft_ms, "total_ms": total_ms}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _chat_messages(prompt: str, content: str, kind: str) -> list[dict]:
+    messages = [{"role": "system", "content": prompt}, {"role": "user", "content": content}]
+    prompt_stats.record(kind, messages)
+    return messages
+
+
+async def _stream_chat_async(user, content):
+    """Yield completion deltas as OpenAI produces them. Uses its own short read session."""
+    client = _async_client_for_user(user)
+    if not client:
+        yield "No AI client configured."
+        return
+    async with aunit_of_work() as rdb:
+        prompt = await _build_system_prompt_async(rdb, user)
+    stream = await client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=_chat_messages(prompt, content, "chat_stream"),
+        stream=True,
+    )
+    async for chunk in stream:
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            yield delta
+
+
+async def _do_chat_async(user, content, prompt: str | None = None, kind: str = "chat"):
+    """One chat completion. `prompt` comes from the caller's read unit of work; if omitted it is
+    built in a short one of its own. No session is open while the completion is awaited."""
+    client = _async_client_for_user(user)
     if not client:
         return "No AI client configured."
-    prompt = _build_system_prompt(db, user)
+    if prompt is None:
+        async with aunit_of_work() as db:
+            prompt = await _build_system_prompt_async(db, user)
     try:
-        comp = client.chat.completions.create(
+        comp = await client.chat.completions.create(
             model=OPENAI_MODEL,
-            messages=[{"role": "system", "content": prompt}, {"role": "user", "content": content}],
+            messages=_chat_messages(prompt, content, kind),
         )
         return (comp.choices[0].message.content or "").strip() or "No response."
     except Exception as e:
@@ -313,45 +543,51 @@ def _do_chat(db, user, content):
 
 # ───────────────────── AGI research (REST API) ─────────────────────
 
-def _do_agi_research(query: str, user: UserORM) -> str:
-    """Use AGI Inc. REST API to research a topic with a browser agent."""
+AGI_POLL_INTERVAL = 2
+AGI_POLL_ATTEMPTS = 45  # ~90s
+
+
+class AGIResearchError(Exception):
+    """Research produced no answer; the message is shown to the user and nothing is cached."""
+
+
+async def _do_agi_research(query: str) -> str:
+    """Use AGI Inc. REST API to research a topic with a browser agent (async; awaits between polls).
+    Raises AGIResearchError with a user-facing message on failure."""
     if not AGI_API_KEY:
-        return "AGI API key not configured. Add AGI_API_KEY to your .env"
+        raise AGIResearchError("AGI API key not configured. Add AGI_API_KEY to your .env")
     headers = {"Authorization": f"Bearer {AGI_API_KEY}", "Content-Type": "application/json"}
 
+    async def agi(method: str, path: str, **kwargs):
+        return await http_client.arequest(method, f"{AGI_BASE_URL}{path}", headers=headers, **kwargs)
+
+    session_id = None
     try:
         # 1. Create a session (API returns 201 Created on success)
-        r = http_requests.post(f"{AGI_BASE_URL}/sessions",
-                               headers=headers,
-                               json={"agent_name": "agi-0"},
-                               timeout=30)
+        r = await agi("POST", "/sessions", json={"agent_name": "agi-0"}, timeout=30)
         if r.status_code not in (200, 201):
-            return f"AGI session creation failed ({r.status_code}): {r.text[:200]}"
+            raise AGIResearchError(f"AGI session creation failed ({r.status_code}): {r.text[:200]}")
         session_data = r.json()
         session_id = session_data.get("session_id") or session_data.get("id")
         if not session_id:
-            return f"AGI returned no session ID: {r.text[:200]}"
+            raise AGIResearchError(f"AGI returned no session ID: {r.text[:200]}")
 
         # 2. Send the research task
-        r2 = http_requests.post(f"{AGI_BASE_URL}/sessions/{session_id}/message",
-                                headers=headers,
-                                json={"message": f"Research the following and return a concise summary with key findings: {query}"},
-                                timeout=30)
+        r2 = await agi("POST", f"/sessions/{session_id}/message", timeout=30,
+                       json={"message": f"Research the following and return a concise summary with key findings: {query}"})
         if r2.status_code not in (200, 201, 202):
-            return f"AGI task send failed ({r2.status_code}): {r2.text[:200]}"
+            raise AGIResearchError(f"AGI task send failed ({r2.status_code}): {r2.text[:200]}")
 
         # 3. Poll for completion (up to 90 seconds)
-        for _ in range(45):
-            time.sleep(2)
-            r3 = http_requests.get(f"{AGI_BASE_URL}/sessions/{session_id}/status",
-                                   headers=headers, timeout=15)
+        for _ in range(AGI_POLL_ATTEMPTS):
+            await asyncio.sleep(AGI_POLL_INTERVAL)
+            r3 = await agi("GET", f"/sessions/{session_id}/status", timeout=15)
             if r3.status_code != 200:
                 continue
             status = r3.json().get("status", "")
             if status in ("finished", "done", "completed"):
                 # Get result messages
-                r4 = http_requests.get(f"{AGI_BASE_URL}/sessions/{session_id}/messages",
-                                       headers=headers, timeout=15)
+                r4 = await agi("GET", f"/sessions/{session_id}/messages", timeout=15)
                 if r4.status_code == 200:
                     msgs = r4.json().get("messages", [])
                     # Find the DONE/result message
@@ -364,38 +600,49 @@ def _do_agi_research(query: str, user: UserORM) -> str:
                     if msgs:
                         last = msgs[-1]
                         return str(last.get("content") or last.get("message") or last)[:3000]
-                return "Research complete but no result text found."
+                raise AGIResearchError("Research complete but no result text found.")
             elif status in ("error", "failed"):
-                return f"AGI research failed with status: {status}"
+                raise AGIResearchError(f"AGI research failed with status: {status}")
 
-        # Cleanup
-        try:
-            http_requests.delete(f"{AGI_BASE_URL}/sessions/{session_id}",
-                                 headers=headers, timeout=10)
-        except Exception:
-            pass
-        return "AGI research timed out after 90s. The query may have been too complex."
+        raise AGIResearchError("AGI research timed out after 90s. The query may have been too complex.")
 
+    except AGIResearchError:
+        raise
     except Exception as e:
         traceback.print_exc()
-        return f"AGI research error: {e}"
+        raise AGIResearchError(f"AGI research error: {e}")
+    finally:
+        # Cleanup: always release the browser session
+        if session_id:
+            try:
+                await agi("DELETE", f"/sessions/{session_id}", timeout=10)
+            except Exception:
+                pass
 
 
-# ───────────────────── Composio actions ─────────────────────
+async def _run_research_job(job_id: str, query: str, user_id: str, user_name: str) -> str:
+    """Background job: run the research (coalesced per normalized query; the caller already
+    missed the cache), then post the result as a new message in the user's chat."""
+    try:
+        answer = await research_cache.get_or_compute(query, _do_agi_research, looked_up=True)
+    except AGIResearchError as e:
+        answer = str(e)
+    async with aunit_of_work() as db:
+        _save_msg(db, user_id, f"agent:{user_id}", f"{user_name}'s Agent", "assistant", f"[AGI Research] {answer}")
+        _save_activity(db, user_id, user_name,
+                       f"[research done] {query[:60]}" + ("..." if len(query) > 60 else ""))
+    return answer
+
+
+def _start_research_job(query: str, user: UserORM) -> str:
+    job_id = jobs.submit("research", _run_research_job, query, user.id, user.name, user_id=user.id)
+    return (f"Research started (job {job_id}). I'll post the findings here as soon as the "
+            f"web agent finishes — keep chatting in the meantime.")
 
-ALL_COMPOSIO_TOOLS = [
-    "GMAIL_SEND_EMAIL",
-    "GMAIL_FETCH_EMAILS",
-    "GMAIL_CREATE_EMAIL_DRAFT",
-    "GOOGLEDOCS_CREATE_DOCUMENT",
-    "GOOGLEDRIVE_FIND_FILE",
-    "GOOGLEDRIVE_CREATE_FILE",
-    "GOOGLECALENDAR_CREATE_EVENT",
-    "GOOGLECALENDAR_FIND_EVENT",
-]
 
+# ───────────────────── Composio actions ─────────────────────
 
-def _do_composio_action(user: UserORM, content: str, tool_name: str = None, db: Session = None) -> str:
+def _do_composio_action(user: UserORM, content: str, tool_name: str = None, recent_context: str = "") -> str:
     """Use Composio to execute an action via OpenAI function calling.
     Includes recent chat history so the AI knows 'that' / 'the transcript' etc."""
     composio = get_composio_client()
@@ -411,15 +658,8 @@ def _do_composio_action(user: UserORM, content: str, tool_name: str = None, db:
         else:
             requested_tools = ALL_COMPOSIO_TOOLS
 
-        # Gather all available tools — skip ones that fail (not connected)
-        tools = []
-        for t in requested_tools:
-            try:
-                got = composio.tools.get(user_id=user_id, tools=[t])
-                if got:
-                    tools.extend(got)
-            except Exception:
-                pass  # toolkit not connected, skip it
+        # Available tools from the per-user schema cache — unconnected toolkits are skipped
+        tools = tool_cache.get(user_id, requested_tools)
 
         if not tools:
             return ("No Composio tools available. Make sure you've connected your accounts "
@@ -430,21 +670,6 @@ def _do_composio_action(user: UserORM, content: str, tool_name: str = None, db:
         if not client:
             return "No OpenAI client for Composio action."
 
-        # Build context from recent messages so "put that into a doc" works
-        recent_context = ""
-        if db:
-            recent_msgs = (
-                db.query(MessageORM)
-                .filter(MessageORM.user_id == user.id)
-                .order_by(MessageORM.created_at.desc())
-                .limit(10)
-                .all()
-            )
-            if recent_msgs:
-                recent_context = "\n".join(
-                    f"{m.sender_name}: {m.content[:500]}" for m in reversed(recent_msgs)
-                )
-
         system_msg = (
             "You are an AI assistant that executes actions using connected tools. "
             "When the user asks you to do something, ALWAYS call the appropriate tool. "
@@ -481,6 +706,22 @@ def _do_composio_action(user: UserORM, content: str, tool_name: str = None, db:
         return f"Composio action error: {err[:500]}"
 
 
+def _do_composio_action_with_session(user: UserORM, content: str, tool_name: str = None) -> str:
+    """Thread-side wrapper for async callers: reads recent chat in a short unit of work, then runs
+    the action with no session open."""
+    # Context from recent messages so "put that into a doc" works
+    with unit_of_work() as db:
+        recent_msgs = (
+            db.query(MessageORM)
+            .filter(MessageORM.user_id == user.id)
+            .order_by(MessageORM.created_at.desc())
+            .limit(10)
+            .all()
+        )
+        recent_context = "\n".join(f"{m.sender_name}: {m.content[:500]}" for m in reversed(recent_msgs))
+    return _do_composio_action(user, content, tool_name=tool_name, recent_context=recent_context)
+
+
 # ───────────────────── Composio connection management ─────────────────────
 
 @app.get("/composio/tools")
@@ -518,27 +759,17 @@ def composio_connect(payload: ConnectRequest, request: Request, db: Session = De
     toolkit = str(payload.toolkit).upper().strip()
 
     try:
-        # Find existing auth config for this toolkit
-        auth_configs = composio.auth_configs.list()
-        target_config = None
-        for ac in auth_configs.items:
-            ac_toolkit = str(ac.toolkit).upper().strip() if ac.toolkit else ""
-            if ac_toolkit == toolkit:
-                target_config = ac
-                break
-
-        if not target_config:
-            # Create with Composio managed auth
-            target_config = composio.auth_configs.create(
-                toolkit=toolkit,
-                options={"type": "use_composio_managed_auth"},
-            )
+        # Auth config for this toolkit from the startup-loaded index (created if missing)
+        target_config = auth_config_index.get_or_create(composio, toolkit)
 
         # Initiate the connection
         connection = composio.connected_accounts.initiate(
             user_id=user_id,
             auth_config_id=target_config.id,
         )
+        # New connection on the way: stop treating this toolkit's tools as unavailable
+        tool_cache.invalidate(user_id)
+        status_cache.invalidate(user_id)
 
         return {
             "connection_id": connection.id,
@@ -552,45 +783,107 @@ def composio_connect(payload: ConnectRequest, request: Request, db: Session = De
 
 
 @app.get("/composio/status")
-def composio_status(request: Request, db: Session = Depends(get_db)):
-    """Check if current user has active Composio connected accounts."""
+def composio_status(request: Request, refresh: bool = False, db: Session = Depends(get_db)):
+    """Check if current user has active Composio connected accounts (cached, refreshed in background).
+    ?refresh=1 fetches from Composio now, e.g. right after connecting a toolkit."""
     user = require_user(request, db)
-    composio = get_composio_client()
-    if not composio:
-        return {"connected": False, "reason": "Composio not configured"}
+    return status_cache.get(f"parallel-{user.name.lower()}", refresh=refresh)
+
+
+MESSAGES_PAGE_DEFAULT = 200
+MESSAGES_PAGE_MAX = 1000
+
+
+def _naive_utc(dt: datetime) -> datetime:
+    """DB columns are naive UTC; normalise fresh tz-aware values to match."""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _encode_cursor(m: MessageORM) -> str:
+    raw = f"{_naive_utc(m.created_at).isoformat()}|{m.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
-    user_id = f"parallel-{user.name.lower()}"
 
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
     try:
-        accounts = composio.connected_accounts.list(
-            user_ids=[user_id],
-        )
-        active = [a for a in accounts.items if str(a.status).upper() == "ACTIVE"]
-        # Extract clean toolkit name from objects like ItemToolkit(slug='GMAIL')
-        def _clean_toolkit(t):
-            s = str(t).upper().strip()
-            # Handle ItemToolkit(SLUG='GMAIL') format
-            import re
-            m = re.search(r"SLUG=['\"]?([A-Z_]+)['\"]?", s)
-            if m:
-                return m.group(1)
-            return s
-        toolkits = list(set(_clean_toolkit(a.toolkit) for a in active if a.toolkit))
-        return {
-            "connected": len(active) > 0,
-            "active_count": len(active),
-            "toolkits": toolkits,
-        }
-    except Exception as e:
-        return {"connected": False, "reason": str(e)}
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, msg_id = raw.split("|", 1)
+        return _naive_utc(datetime.fromisoformat(ts)), msg_id
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
 
 
 @app.get("/messages", response_model=list[MessageOut])
-def get_messages(request: Request, db: Session = Depends(get_db)):
+def get_messages(
+    request: Request,
+    response: Response,
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    limit: int = MESSAGES_PAGE_DEFAULT,
+    db: Session = Depends(get_db),
+):
+    """Keyset-paginated history on (created_at, id), oldest first.
+
+    - no cursor: the newest `limit` messages
+    - since=<cursor>: messages after the cursor (incremental refresh)
+    - before=<cursor>: the `limit` messages just older than the cursor (scroll back)
+    Cursors come from the X-Next-Cursor / X-Prev-Cursor headers. Sending the last
+    ETag as If-None-Match returns 304 when nothing changed.
+    """
     user = require_user(request, db)
     touch(db, user)
-    return (db.query(MessageORM).filter(MessageORM.user_id == user.id)
-            .order_by(MessageORM.created_at.asc()).all())
+    limit = max(1, min(limit, MESSAGES_PAGE_MAX))
+
+    latest = (db.query(MessageORM.created_at, MessageORM.id)
+              .filter(MessageORM.user_id == user.id)
+              .order_by(MessageORM.created_at.desc(), MessageORM.id.desc())
+              .first())
+    latest_cursor = _encode_cursor(latest) if latest else "empty"
+    etag = f'W/"{latest_cursor}.{since or ""}.{before or ""}.{limit}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    q = db.query(MessageORM).filter(MessageORM.user_id == user.id)
+    if since:
+        ts, msg_id = _decode_cursor(since)
+        q = q.filter(or_(MessageORM.created_at > ts,
+                         and_(MessageORM.created_at == ts, MessageORM.id > msg_id)))
+    if before:
+        ts, msg_id = _decode_cursor(before)
+        q = q.filter(or_(MessageORM.created_at < ts,
+                         and_(MessageORM.created_at == ts, MessageORM.id < msg_id)))
+
+    if since and not before:
+        rows = q.order_by(MessageORM.created_at.asc(), MessageORM.id.asc()).limit(limit).all()
+    else:
+        rows = q.order_by(MessageORM.created_at.desc(), MessageORM.id.desc()).limit(limit).all()
+        rows.reverse()
+        if len(rows) < limit and not since:
+            # Hot table exhausted: continue scrolling back into the archive tier
+            if rows:
+                anchor = (rows[0].created_at, rows[0].id)
+            else:
+                anchor = _decode_cursor(before) if before else (None, None)
+            rows = archive.page_before(db, user.id, *anchor, limit - len(rows)) + rows
+
+    response.headers["ETag"] = etag
+    if rows:
+        response.headers["X-Prev-Cursor"] = _encode_cursor(rows[0])
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    elif since:
+        response.headers["X-Next-Cursor"] = since
+    return rows
+
+
+@app.get("/messages/search", response_model=list[MessageOut])
+def search_messages(request: Request, q: str, limit: int = 50, db: Session = Depends(get_db)):
+    """Your messages containing every word of `q` (case-insensitive substrings), newest
+    first, across the hot table and the archive."""
+    user = require_user(request, db)
+    limit = max(1, min(limit, MESSAGES_PAGE_MAX))
+    return archive.search(db, user.id, q, limit)
 
 
 # ───────────────── summary: Google Doc + email ─────────────────
@@ -600,131 +893,127 @@ class SummaryRequest(BaseModel):
     email_to: str  # email address to send the summary to
 
 
-@app.post("/summary/generate")
-def generate_summary(payload: SummaryRequest, request: Request, db: Session = Depends(get_db)):
+SUMMARY_TOOLS = ["GOOGLEDOCS_CREATE_DOCUMENT", "GMAIL_SEND_EMAIL"]
+SUMMARY_SYSTEM_PROMPT = (
+    "You are a professional report writer. Summarize the following team workspace conversation "
+    "into a well-structured report. Include:\n"
+    "- Executive Summary (2-3 sentences)\n"
+    "- Key Topics Discussed\n"
+    "- Action Items / Decisions Made\n"
+    "- Participant Summary (who said what)\n"
+    "- Timeline of Events\n\n"
+    "Format it nicely with headers and bullet points."
+)
+
+
+@app.post("/summary/generate", status_code=202)
+async def generate_summary(payload: SummaryRequest, request: Request):
     """
-    1. Summarize the entire chat history via OpenAI
-    2. Create a Google Doc with the summary via Composio
-    3. Email the doc link to the recipient via Composio/Gmail
+    Start a summary job and return its id right away; poll GET /jobs/{job_id}.
+    The job:
+    1. Summarizes the chat history via OpenAI (while prefetching the Composio tool schemas)
+    2. Creates a Google Doc with the summary via Composio
+    3. Emails the summary to the recipient via Composio/Gmail, linking the Doc when step 2 produced one
     """
-    user = require_user(request, db)
-    touch(db, user)
-    composio = get_composio_client()
-    if not composio:
+    async with aunit_of_work() as db:
+        user = await require_user_async(request, db)
+        user.last_seen_at = datetime.now(timezone.utc)
+        # Quiet workspaces may only have archived history left; the summarizer reads both tiers.
+        has_messages = ((await db.execute(select(MessageORM.id).limit(1))).first() is not None
+                        or (await db.execute(select(ArchivedDayORM.day).limit(1))).first() is not None)
+    if not get_composio_client():
         raise HTTPException(500, "Composio not configured")
-
-    user_id = f"parallel-{user.name.lower()}"
-    client = _client_for_user(user)
-    if not client:
+    if not _async_client_for_user(user):
         raise HTTPException(500, "No OpenAI client configured")
-
-    # ── Step 1: Gather all messages and build a summary ──
-    all_msgs = db.query(MessageORM).order_by(MessageORM.created_at.asc()).all()
-    if not all_msgs:
+    if not has_messages:
         raise HTTPException(400, "No messages to summarize")
 
-    conversation_text = "\n".join(
-        f"[{m.created_at.strftime('%Y-%m-%d %H:%M')}] {m.sender_name} ({m.role}): {m.content}"
-        for m in all_msgs
-    )
+    job_id = jobs.submit("summary", _run_summary_job, user.id, user.name, payload.email_to, user_id=user.id)
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _run_summary_job(job_id: str, user_id: str, user_name: str, email_to: str) -> dict:
+    """Background job behind /summary/generate. Returns {summary, steps, doc_url?}."""
+    composio_user = f"parallel-{user_name.lower()}"
+    client = _async_client_for_name(user_name)
 
-    # Use OpenAI to create a structured summary
+    # ── Step 1: fold new messages into the rolling window summaries and merge them,
+    #    with the tool schemas fetched alongside ──
+    jobs.update(job_id, step="summarizing")
+    prefetch = asyncio.create_task(asyncio.to_thread(tool_cache.get, composio_user, SUMMARY_TOOLS))
     try:
-        summary_resp = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            messages=[
-                {"role": "system", "content": (
-                    "You are a professional report writer. Summarize the following team workspace conversation "
-                    "into a well-structured report. Include:\n"
-                    "- Executive Summary (2-3 sentences)\n"
-                    "- Key Topics Discussed\n"
-                    "- Action Items / Decisions Made\n"
-                    "- Participant Summary (who said what)\n"
-                    "- Timeline of Events\n\n"
-                    "Format it nicely with headers and bullet points."
-                )},
-                {"role": "user", "content": f"Here is the conversation:\n\n{conversation_text[:8000]}"},
-            ],
-        )
-        summary_text = (summary_resp.choices[0].message.content or "").strip()
+        summary_text, message_count = await summarizer.report(client, SUMMARY_SYSTEM_PROMPT)
+    except Exception as e:
+        prefetch.cancel()
+        raise RuntimeError(f"Failed to generate summary: {e}")
+    try:
+        await prefetch
     except Exception as e:
-        raise HTTPException(502, f"Failed to generate summary: {e}")
+        logger.warning(f"Summary tool prefetch failed: {e}")
 
     now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
     doc_title = f"Parallel AI - Team Summary - {now_str}"
 
-    results = {"summary": summary_text, "steps": []}
+    # ── Steps 2 + 3: create the Doc, then email; the email links the Doc only if it was created ──
+    jobs.update(job_id, step="delivering")
+    doc_step, doc_url = await asyncio.to_thread(_create_summary_doc, composio_user, doc_title, summary_text)
+    email_body = (
+        f"Hi,\n\nHere is the team workspace summary from Parallel AI:\n\n"
+        f"{'='*50}\n{summary_text}\n{'='*50}\n\n"
+        + (f"A copy was saved to Google Docs as \"{doc_title}\": {doc_url}\n\n" if doc_url else "")
+        + f"Generated by Parallel AI on {now_str}"
+    )
+    email_step = await asyncio.to_thread(_email_summary, composio_user, email_to, doc_title, email_body)
+    results = {"summary": summary_text, "steps": [doc_step, email_step]}
+
+    # Log activity
+    async with aunit_of_work() as db:
+        _save_activity(db, user_id, user_name, f"[Summary] Generated & emailed to {email_to}")
+        _save_msg(db, user_id, f"agent:{user_id}", f"{user_name}'s Agent", "assistant",
+                  f"[Summary Report] Created summary with {message_count} messages. "
+                  f"{'Google Doc created: ' + doc_url + ' ' if doc_url else ''}"
+                  f"Emailed to {email_to}.")
+
+    if doc_url:
+        results["doc_url"] = doc_url
+    return results
+
+
+def _extract_doc_url(result_str: str) -> str | None:
+    """Google Doc URL from a Composio Docs result (direct link, or built from the document id)."""
+    url_match = re.search(r'https://docs\.google\.com/[^\s\'"]+', result_str)
+    if url_match:
+        return url_match.group(0)
+    id_match = re.search(r'[\'"]?(?:documentId|document_id)[\'"]?\s*[:=]\s*[\'"]([a-zA-Z0-9_-]+)[\'"]', result_str)
+    if id_match:
+        return f"https://docs.google.com/document/d/{id_match.group(1)}/edit"
+    return None
 
-    # ── Step 2: Create Google Doc ──
-    doc_url = None
+
+def _create_summary_doc(user_id: str, doc_title: str, summary_text: str) -> tuple[dict, str | None]:
+    """Worker-thread step: create the Google Doc. Returns (step result, doc url)."""
     try:
-        tools = composio.tools.get(user_id=user_id, tools=["GOOGLEDOCS_CREATE_DOCUMENT"])
-        if tools:
-            doc_resp = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                tools=tools,
-                messages=[{"role": "user", "content": (
-                    f"Create a new Google Doc with the title '{doc_title}' and the following content:\n\n{summary_text}"
-                )}],
-            )
-            doc_result = composio.provider.handle_tool_calls(response=doc_resp, user_id=user_id)
-            results["steps"].append({"step": "google_doc", "status": "success", "result": str(doc_result)[:500]})
-
-            # Try to extract the doc URL from the result
-            result_str = str(doc_result)
-            if "docs.google.com" in result_str:
-                import re
-                url_match = re.search(r'https://docs\.google\.com/[^\s\'"]+', result_str)
-                if url_match:
-                    doc_url = url_match.group(0)
-            elif "documentId" in result_str or "document_id" in result_str:
-                import re
-                id_match = re.search(r'[\'"]?(?:documentId|document_id)[\'"]?\s*[:=]\s*[\'"]([a-zA-Z0-9_-]+)[\'"]', result_str)
-                if id_match:
-                    doc_url = f"https://docs.google.com/document/d/{id_match.group(1)}/edit"
-        else:
-            results["steps"].append({"step": "google_doc", "status": "skipped", "reason": "Google Docs not connected"})
+        doc_result = execute_tool(user_id, "GOOGLEDOCS_CREATE_DOCUMENT", {"title": doc_title, "text": summary_text})
+        if doc_result is None:
+            return {"step": "google_doc", "status": "skipped", "reason": "Google Docs not connected"}, None
+        return ({"step": "google_doc", "status": "success", "result": str(doc_result)[:500]},
+                _extract_doc_url(str(doc_result)))
     except Exception as e:
         traceback.print_exc()
-        results["steps"].append({"step": "google_doc", "status": "error", "error": str(e)[:300]})
+        return {"step": "google_doc", "status": "error", "error": str(e)[:300]}, None
 
-    # ── Step 3: Email the summary + doc link ──
+
+def _email_summary(user_id: str, email_to: str, subject: str, body: str) -> dict:
+    """Worker-thread step: email the summary. Returns the step result."""
     try:
-        email_body = f"Hi,\n\nHere is the team workspace summary from Parallel AI:\n\n"
-        email_body += f"{'='*50}\n{summary_text}\n{'='*50}\n\n"
-        if doc_url:
-            email_body += f"Google Doc: {doc_url}\n\n"
-        email_body += f"Generated by Parallel AI on {now_str}"
-
-        tools = composio.tools.get(user_id=user_id, tools=["GMAIL_SEND_EMAIL"])
-        if tools:
-            email_resp = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                tools=tools,
-                messages=[{"role": "user", "content": (
-                    f"Send an email to {payload.email_to} with the subject '{doc_title}' "
-                    f"and the following body:\n\n{email_body}"
-                )}],
-            )
-            email_result = composio.provider.handle_tool_calls(response=email_resp, user_id=user_id)
-            results["steps"].append({"step": "email", "status": "success", "result": str(email_result)[:300]})
-        else:
-            results["steps"].append({"step": "email", "status": "skipped", "reason": "Gmail not connected"})
+        email_result = execute_tool(user_id, "GMAIL_SEND_EMAIL",
+                                    {"recipient_email": email_to, "subject": subject, "body": body})
+        if email_result is None:
+            return {"step": "email", "status": "skipped", "reason": "Gmail not connected"}
+        return {"step": "email", "status": "success", "result": str(email_result)[:300]}
     except Exception as e:
         traceback.print_exc()
-        results["steps"].append({"step": "email", "status": "error", "error": str(e)[:300]})
-
-    # Log activity
-    _save_activity(db, user.id, user.name, f"[Summary] Generated & emailed to {payload.email_to}")
-    _save_msg(db, user.id, f"agent:{user.id}", f"{user.name}'s Agent", "assistant",
-              f"[Summary Report] Created summary with {len(all_msgs)} messages. "
-              f"{'Google Doc created. ' if doc_url else ''}"
-              f"Emailed to {payload.email_to}.")
-    db.commit()
-
-    if doc_url:
-        results["doc_url"] = doc_url
-    return results
+        return {"step": "email", "status": "error", "error": str(e)[:300]}
 
 
 # ───────────────────────── activity ─────────────────────────
@@ -875,18 +1164,18 @@ async def voice_transcription(request: Request):
     if not transcription:
         return {"ok": False, "reason": "no transcription"}
 
-    db = SessionLocal()
-    try:
-        user = db.query(UserORM).filter(UserORM.name == caller).first()
+    async with aunit_of_work() as db:
+        user = (await db.execute(select(UserORM).where(UserORM.name == caller))).scalars().first()
         if not user:
             return {"ok": False, "reason": f"user {caller} not found"}
         _save_msg(db, user.id, f"voice:{user.id}", f"{user.name} (voice)", "user", transcription)
         _save_activity(db, user.id, user.name, f"[Voice] {transcription[:60]}")
-        answer = _do_chat(db, user, transcription)
+        prompt = await _build_system_prompt_async(db, user)
+
+    answer = await _do_chat_async(user, transcription, prompt, kind="voice")
+
+    async with aunit_of_work() as db:
         _save_msg(db, user.id, f"agent:{user.id}", f"{user.name}'s Agent", "assistant", f"[Voice reply] {answer}")
-        db.commit()
-    finally:
-        db.close()
     return {"ok": True}
 
 
@@ -914,29 +1203,31 @@ async def sms_incoming(request: Request):
     if not text:
         return {"ok": False}
 
-    db = SessionLocal()
-    try:
+    async with aunit_of_work() as db:
         user = None
         for name in ["Sean", "Yug"]:
             if text.lower().startswith(name.lower()):
-                user = db.query(UserORM).filter(UserORM.name == name).first()
+                user = (await db.execute(select(UserORM).where(UserORM.name == name))).scalars().first()
                 text = text[len(name):].strip().lstrip(":").strip()
                 break
         if not user:
-            user = db.query(UserORM).first()
-        if user and text:
-            _save_msg(db, user.id, f"sms:{sender}", f"{user.name} (SMS)", "user", text)
-            _save_activity(db, user.id, user.name, f"[SMS] {text[:60]}")
-            answer = _do_chat(db, user, text)
-            _save_msg(db, user.id, f"agent:{user.id}", f"{user.name}'s Agent", "assistant", f"[SMS reply] {answer}")
-            db.commit()
-            if PLIVO_CLIENT and PLIVO_PHONE_NUMBER:
-                try:
-                    PLIVO_CLIENT.messages.create(src=PLIVO_PHONE_NUMBER, dst=sender, text=answer[:1600])
-                except Exception as e:
-                    print(f"SMS reply error: {e}")
-    finally:
-        db.close()
+            user = (await db.execute(select(UserORM))).scalars().first()
+        if not (user and text):
+            return {"ok": True}
+        _save_msg(db, user.id, f"sms:{sender}", f"{user.name} (SMS)", "user", text)
+        _save_activity(db, user.id, user.name, f"[SMS] {text[:60]}")
+        prompt = await _build_system_prompt_async(db, user)
+
+    answer = await _do_chat_async(user, text, prompt, kind="sms")
+
+    async with aunit_of_work() as db:
+        _save_msg(db, user.id, f"agent:{user.id}", f"{user.name}'s Agent", "assistant", f"[SMS reply] {answer}")
+    if PLIVO_CLIENT and PLIVO_PHONE_NUMBER:
+        try:
+            await run_in_threadpool(PLIVO_CLIENT.messages.create,
+                                    src=PLIVO_PHONE_NUMBER, dst=sender, text=answer[:1600])
+        except Exception as e:
+            print(f"SMS reply error: {e}")
     return {"ok": True}
 
 
@@ -955,6 +1246,7 @@ def _start_plivo_recording(call_uuid: str) -> bool:
             callback_method="POST",
             file_format="mp3",
         )
+        recordings.expect(call_uuid)
         logger.info(f"Started Plivo recording for call {call_uuid}")
         return True
     except Exception as e:
@@ -970,22 +1262,28 @@ def _fetch_and_transcribe_recording(call_uuid: str, caller_name: str):
         logger.info("No Plivo client or call UUID — skipping transcription")
         return
 
-    # Wait for Plivo to process the recording — check at 2s, then every 1.5s (faster)
-    recording_url = None
-    for attempt in range(10):
-        _time.sleep(2 if attempt == 0 else 1.5)
+    # Plivo posts the URL to /voice/recording-callback as soon as the file is ready
+    recording_url = recordings.wait(call_uuid)
+    if recording_url:
+        logger.info(f"Recording ready via callback: {recording_url}")
+
+    # Fallback when the callback didn't arrive: poll Plivo — every 1.5s
+    for attempt in range(0 if recording_url else 10):
+        if attempt:
+            _time.sleep(1.5)
         try:
             auth = (PLIVO_AUTH_ID, PLIVO_AUTH_TOKEN)
-            r = http_requests.get(
+            r = http_client.request(
+                "GET",
                 f"https://api.plivo.com/v1/Account/{PLIVO_AUTH_ID}/Recording/",
                 auth=auth,
                 params={"call_uuid": call_uuid, "limit": 5},
                 timeout=15,
             )
             if r.status_code == 200:
-                recordings = r.json().get("objects", [])
-                if recordings:
-                    recording_url = recordings[0].get("recording_url")
+                objects = r.json().get("objects", [])
+                if objects:
+                    recording_url = objects[0].get("recording_url")
                     if recording_url:
                         logger.info(f"Found recording: {recording_url}")
                         break
@@ -1003,35 +1301,25 @@ def _fetch_and_transcribe_recording(call_uuid: str, caller_name: str):
         )
         return
 
-    # Download the recording
+    client = _client_for_name(caller_name)
+    if not client:
+        logger.error("No OpenAI client for Whisper transcription")
+        return
+
+    # Stream the recording to disk (never held in memory whole)
     try:
         logger.info(f"Downloading recording from {recording_url}")
-        audio_resp = http_requests.get(recording_url, timeout=60)
-        if audio_resp.status_code != 200:
-            logger.error(f"Recording download failed: {audio_resp.status_code}")
-            return
-        audio_data = audio_resp.content
+        audio_path = download_to_tempfile(recording_url)
     except Exception as e:
         logger.error(f"Recording download error: {e}")
         return
 
-    # Transcribe with OpenAI Whisper
+    # Transcribe with OpenAI Whisper (long recordings in concurrent chunks)
     try:
-        client = CLIENTS.get(caller_name.lower()) or CLIENTS.get("sean") or next(iter(CLIENTS.values()), None)
-        if not client:
-            logger.error("No OpenAI client for Whisper transcription")
-            return
-
-        import io
-        audio_file = io.BytesIO(audio_data)
-        audio_file.name = "call_recording.mp3"
-
-        transcript_resp = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=audio_file,
-            language="en",
-        )
-        raw_transcript = transcript_resp.text.strip()
+        try:
+            raw_transcript = transcribe_file(client, audio_path, language="en")
+        finally:
+            os.unlink(audio_path)
         logger.info(f"Whisper raw transcript ({len(raw_transcript)} chars): {raw_transcript[:200]}")
 
         if not raw_transcript:
@@ -1039,7 +1327,6 @@ def _fetch_and_transcribe_recording(call_uuid: str, caller_name: str):
             return
 
         # Fast local dedupe: remove consecutive duplicate lines and "word word" (no extra API call)
-        import re
         lines = [ln.strip() for ln in raw_transcript.splitlines() if ln.strip()]
         seen = None
         deduped_lines = []
@@ -1074,17 +1361,15 @@ def _fetch_and_transcribe_recording(call_uuid: str, caller_name: str):
 
         logger.info(f"Final transcript ({len(transcript_text)} chars)")
 
-        # Save transcript to chat
+        # Save transcript to chat + activity (one short write)
+        preview = transcript_text[:100] + ("..." if len(transcript_text) > 100 else "")
         _save_msg_sync(
             caller_name,
             f"[Voice Call Transcript]\n\n{transcript_text}",
             "assistant",
+            activity=f"[Voice Call] {preview}",
         )
 
-        # Save activity
-        preview = transcript_text[:100] + ("..." if len(transcript_text) > 100 else "")
-        _save_activity_sync(caller_name, f"[Voice Call] {preview}")
-
         # Try to save to Google Doc (best effort)
         try:
             from voice_agent import _save_transcript_to_google_doc
@@ -1101,30 +1386,21 @@ def _fetch_and_transcribe_recording(call_uuid: str, caller_name: str):
         )
 
 
-def _save_msg_sync(caller_name: str, content: str, role: str):
-    """Save a message to DB (synchronous helper)."""
-    db = SessionLocal()
-    try:
-        user = db.query(UserORM).filter(UserORM.name == caller_name).first()
-        if not user:
-            return
-        _save_msg(db, user.id, f"voice:{user.id}", f"{caller_name} (voice call)", role, content)
-        db.commit()
-    finally:
-        db.close()
+async def _run_transcription_job(job_id: str, call_uuid: str, caller_name: str):
+    """Background job: the blocking fetch/transcribe pipeline runs on a worker thread;
+    the job kind's limit caps how many calls are transcribed at once."""
+    await asyncio.to_thread(_fetch_and_transcribe_recording, call_uuid, caller_name)
 
 
-def _save_activity_sync(caller_name: str, summary: str):
-    """Save an activity row to DB (synchronous helper)."""
-    db = SessionLocal()
-    try:
+def _save_msg_sync(caller_name: str, content: str, role: str, activity: str | None = None):
+    """Save a message (and optionally an activity row) in one short unit of work (worker threads)."""
+    with unit_of_work() as db:
         user = db.query(UserORM).filter(UserORM.name == caller_name).first()
         if not user:
             return
-        _save_activity(db, user.id, caller_name, summary)
-        db.commit()
-    finally:
-        db.close()
+        _save_msg(db, user.id, f"voice:{user.id}", f"{caller_name} (voice call)", role, content)
+        if activity:
+            _save_activity(db, user.id, caller_name, activity)
 
 
 @app.websocket("/voice/ws")
@@ -1178,19 +1454,36 @@ async def voice_websocket(websocket: WebSocket):
 
         # ── After hangup: fetch recording and transcribe ──
         if call_id:
-            import threading
-            threading.Thread(
-                target=_fetch_and_transcribe_recording,
-                args=(call_id, caller),
-                daemon=True,
-            ).start()
+            jobs.submit("transcription", _run_transcription_job, call_id, caller)
         else:
             logger.warning(f"No call_id for {caller} — skipping transcript")
 
 
+def _valid_plivo_signature(request: Request, params: dict) -> bool:
+    """Check X-Plivo-Signature-V3 against our auth token and the public callback URL."""
+    signature = request.headers.get("x-plivo-signature-v3")
+    nonce = request.headers.get("x-plivo-signature-v3-nonce")
+    if not (PLIVO_AUTH_TOKEN and signature and nonce):
+        return False
+    base = (TUNNEL_PUBLIC_URL or "").rstrip("/")
+    url = f"{base}{request.url.path}" if base else str(request.url)
+    try:
+        from plivo.utils import validate_v3_signature
+        return validate_v3_signature(request.method, url, nonce, PLIVO_AUTH_TOKEN, signature, params)
+    except Exception as e:
+        logger.warning(f"Plivo signature check failed: {e}")
+        return False
+
+
 @app.post("/voice/recording-callback")
 async def voice_recording_callback(request: Request):
-    """Plivo posts here when a call recording is ready."""
-    form = await request.form()
-    logger.info(f"Recording callback: {dict(form)}")
+    """Plivo posts here when a call recording is ready; hands the URL to the waiting transcription job."""
+    form = dict(await request.form())
+    if not _valid_plivo_signature(request, form):
+        raise HTTPException(403, "Invalid Plivo signature")
+    logger.info(f"Recording callback: {form}")
+    call_uuid = form.get("call_uuid") or form.get("CallUUID")
+    record_url = form.get("record_url") or form.get("RecordUrl") or form.get("recording_url")
+    if call_uuid and record_url and not recordings.deliver(call_uuid, record_url):
+        logger.warning(f"Ignoring recording callback for unexpected call {call_uuid}")
     return {"ok": True}
@@ -0,0 +1,14 @@
+"""
+Deploy step: bring the database schema to the latest migration.
+
+Unlike a bare `alembic upgrade head`, this first stamps databases that were
+built by create_all before migrations existed (no alembic_version table) at
+the baseline revision, so their existing tables aren't created twice.
+
+Usage:  python migrate.py
+"""
+
+from database import migrate_to_head
+
+migrate_to_head()
+print("Database schema is up to date.")
@@ -0,0 +1,51 @@
+"""Alembic environment: runs migrations against DATABASE_URL with the app's models."""
+
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from database import Base, engine
+import models  # noqa: F401  (registers tables on Base.metadata)
+
+config = context.config
+# Skip logging setup when the app runs migrations at boot (it would reset uvicorn's loggers).
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Emit SQL to stdout (alembic upgrade head --sql)."""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Own unpooled engine: the app engine carries DB_STATEMENT_TIMEOUT_MS, which would cancel
+    # a CONCURRENTLY index build on a large table and leave an INVALID index behind.
+    connectable = create_engine(engine.url, poolclass=NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things in place; batch mode rebuilds the table.
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,79 @@
+"""Objects added after the baseline while the app still built its schema with
+create_all: the (created_at, id) keyset index on messages (which replaces the
+single-column ix_messages_created_at), the research_results cache and the
+summary_chunks table.
+
+Databases created by create_all after the baseline already have some of these,
+so each one is only created when missing.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _online():
+    """CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction on Postgres."""
+    ctx = op.get_context()
+    if ctx.dialect.name == "postgresql":
+        return ctx.autocommit_block(), {"postgresql_concurrently": True}
+    return nullcontext(), {}
+
+
+def _has_table(name: str) -> bool:
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    if not _has_table("research_results"):
+        op.create_table(
+            "research_results",
+            sa.Column("query_key", sa.String(), nullable=False),
+            sa.Column("query", sa.Text(), nullable=False),
+            sa.Column("result", sa.Text(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("query_key"),
+        )
+        op.create_index("ix_research_results_created_at", "research_results", ["created_at"])
+
+    if not _has_table("summary_chunks"):
+        op.create_table(
+            "summary_chunks",
+            sa.Column("window_start", sa.DateTime(), nullable=False),
+            sa.Column("window_end", sa.DateTime(), nullable=False),
+            sa.Column("summary", sa.Text(), nullable=False),
+            sa.Column("message_count", sa.Integer(), nullable=False),
+            sa.Column("last_created_at", sa.DateTime(), nullable=False),
+            sa.Column("last_message_id", sa.String(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("window_start"),
+        )
+
+    block, kw = _online()
+    with block:
+        op.create_index("ix_messages_created_at_id", "messages", ["created_at", "id"], if_not_exists=True, **kw)
+        # Every created_at-only lookup is a prefix of the composite; the old index is pure write cost.
+        op.drop_index("ix_messages_created_at", table_name="messages", if_exists=True, **kw)
+
+
+def downgrade() -> None:
+    block, kw = _online()
+    with block:
+        op.create_index("ix_messages_created_at", "messages", ["created_at"], **kw)
+        op.drop_index("ix_messages_created_at_id", table_name="messages", **kw)
+    op.drop_table("summary_chunks")
+    op.drop_table("research_results")
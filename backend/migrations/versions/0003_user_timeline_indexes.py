@@ -0,0 +1,51 @@
+"""Composite (user_id, created_at) indexes for per-user timelines.
+
+GET /messages, the Composio action context and the voice teammate lookup all
+filter by user_id and order by created_at. The composite indexes cover those
+plans and make the single-column user_id indexes redundant. On Postgres the
+indexes are built CONCURRENTLY so large tables stay writable.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+"""
+from contextlib import nullcontext
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _online():
+    """CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction on Postgres."""
+    ctx = op.get_context()
+    if ctx.dialect.name == "postgresql":
+        return ctx.autocommit_block(), {"postgresql_concurrently": True}
+    return nullcontext(), {}
+
+
+def upgrade() -> None:
+    block, kw = _online()
+    with block:
+        # IF [NOT] EXISTS: databases built by create_all after this change already match.
+        op.create_index("ix_messages_user_id_created_at", "messages", ["user_id", "created_at", "id"],
+                        if_not_exists=True, **kw)
+        op.create_index("ix_activities_user_id_created_at", "activities", ["user_id", "created_at"],
+                        if_not_exists=True, **kw)
+        op.drop_index("ix_messages_user_id", table_name="messages", if_exists=True, **kw)
+        op.drop_index("ix_activities_user_id", table_name="activities", if_exists=True, **kw)
+
+
+def downgrade() -> None:
+    block, kw = _online()
+    with block:
+        op.create_index("ix_activities_user_id", "activities", ["user_id"], **kw)
+        op.create_index("ix_messages_user_id", "messages", ["user_id"], **kw)
+        op.drop_index("ix_activities_user_id_created_at", table_name="activities", **kw)
+        op.drop_index("ix_messages_user_id_created_at", table_name="messages", **kw)
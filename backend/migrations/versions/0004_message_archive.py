@@ -0,0 +1,47 @@
+"""Message archive tier: per-day compressed blobs plus a per-message locator index.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "message_archive_days",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("first_at", sa.DateTime(), nullable=False),
+        sa.Column("last_at", sa.DateTime(), nullable=False),
+        sa.Column("terms", sa.Text(), nullable=False),
+        sa.Column("payload", sa.LargeBinary(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("day"),
+    )
+    op.create_table(
+        "message_archive_index",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_message_archive_index_day", "message_archive_index", ["day"])
+    op.create_index("ix_message_archive_index_user_id_created_at", "message_archive_index",
+                    ["user_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_table("message_archive_index")
+    op.drop_table("message_archive_days")
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, Text
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text
 from sqlalchemy.orm import relationship
 
 from database import Base
@@ -31,19 +31,80 @@ class Message(Base):
     """Global shared message log. user_id = the user this message belongs to (sender or whose agent replied)."""
     __tablename__ = "messages"
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     sender_id = Column(String, nullable=False)
     sender_name = Column(String, nullable=False)
     role = Column(String, nullable=False)  # "user" | "assistant"
     content = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Newest-N prompt context orders by (created_at DESC, id DESC): a backward scan of this index.
+        # Also serves every created_at-only range/order, so there is no single-column index.
+        Index("ix_messages_created_at_id", "created_at", "id"),
+        # One user's timeline (GET /messages, Composio action context), keyset-ordered.
+        Index("ix_messages_user_id_created_at", "user_id", "created_at", "id"),
+    )
 
 
 class Activity(Base):
     """One-line activity summary per user action, for team activity feed."""
     __tablename__ = "activities"
     id = Column(String, primary_key=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False)
     user_name = Column(String, nullable=False)
     summary = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        # Latest activity for one teammate (voice get_teammate_status).
+        Index("ix_activities_user_id_created_at", "user_id", "created_at"),
+    )
+
+
+class ResearchResult(Base):
+    """Cached AGI research answer keyed by normalized query (see research_cache.py)."""
+    __tablename__ = "research_results"
+    query_key = Column(String, primary_key=True)  # sha256 of the normalized query
+    query = Column(Text, nullable=False)
+    result = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SummaryChunk(Base):
+    """Rolling summary of one time window of the message log (see summaries.py)."""
+    __tablename__ = "summary_chunks"
+    window_start = Column(DateTime, primary_key=True)
+    window_end = Column(DateTime, nullable=False)
+    summary = Column(Text, nullable=False)
+    message_count = Column(Integer, nullable=False, default=0)
+    # Checkpoint: newest (created_at, id) already folded into this summary.
+    last_created_at = Column(DateTime, nullable=False)
+    last_message_id = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedDay(Base):
+    """Cold tier: one UTC day of messages moved out of `messages`, zlib-compressed JSON lines (see archive.py)."""
+    __tablename__ = "message_archive_days"
+    day = Column(Date, primary_key=True)
+    message_count = Column(Integer, nullable=False)
+    first_at = Column(DateTime, nullable=False)
+    last_at = Column(DateTime, nullable=False)
+    # " term term ... " — distinct lowercase words of the day, for LIKE '% word %' search.
+    terms = Column(Text, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedMessage(Base):
+    """Locator for an archived message: which day blob holds it (no content)."""
+    __tablename__ = "message_archive_index"
+    id = Column(String, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    user_id = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_message_archive_index_user_id_created_at", "user_id", "created_at", "id"),
+    )
@@ -0,0 +1,119 @@
+"""
+Token-aware prompt assembly.
+
+Counts tokens with a local tokenizer (tiktoken, when installed; otherwise a
+~4 chars/token estimate), caches counts per message line (count_tokens; large
+one-off texts such as whole prompts go through the uncached count_text_tokens),
+fills a budget newest-first, and keeps per-request prompt-token stats for /metrics.
+"""
+
+import os
+import threading
+from functools import lru_cache
+
+from loguru import logger
+
+from config import OPENAI_MODEL
+
+# Per-message cap inside prompt context (replaces the old content[:300] char cut).
+MESSAGE_TOKEN_CAP = int(os.getenv("PROMPT_MESSAGE_TOKENS", "80"))
+# Budget for one summary prompt: merged window summaries in /summary/generate (was [:8000] chars).
+SUMMARY_INPUT_TOKENS = int(os.getenv("SUMMARY_INPUT_TOKENS", "6000"))
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """tiktoken encoding for OPENAI_MODEL, or None if tiktoken is unavailable."""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+    _encoding_loaded = True
+    try:
+        import tiktoken
+        try:
+            _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.info(f"tiktoken unavailable, estimating tokens from length: {e}")
+        _encoding = None
+    return _encoding
+
+
+def count_text_tokens(text: str) -> int:
+    """Uncached count, for large or one-off texts (system prompts, summary batches)."""
+    enc = _get_encoding()
+    if enc is None:
+        return len(text) // 4 + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Cached count for short per-message lines that recur across prompts."""
+    return count_text_tokens(text)
+
+
+def truncate_text_tokens(text: str, max_tokens: int) -> str:
+    """Cut `text` to at most `max_tokens` tokens, marking the cut with an ellipsis (uncached)."""
+    enc = _get_encoding()
+    if enc is None:
+        limit = max_tokens * 4
+        return text if len(text) <= limit else text[:limit].rstrip() + "…"
+    ids = enc.encode(text, disallowed_special=())
+    if len(ids) <= max_tokens:
+        return text
+    return enc.decode(ids[:max_tokens]).rstrip() + "…"
+
+
+@lru_cache(maxsize=4096)
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cached truncate_text_tokens, for message texts that recur across prompts."""
+    return truncate_text_tokens(text, max_tokens)
+
+
+def fit_newest_first(lines_newest_first, budget: int, max_items: int | None = None) -> list[str]:
+    """Take lines newest-first until `budget` tokens (or `max_items`) is reached; return oldest-first."""
+    out: list[str] = []
+    used = 0
+    for line in lines_newest_first:
+        if max_items is not None and len(out) >= max_items:
+            break
+        if budget:
+            cost = count_tokens(line) + 1  # + newline
+            if used + cost > budget:
+                break
+            used += cost
+        out.append(line)
+    out.reverse()
+    return out
+
+
+class PromptStats:
+    """Running prompt-token counters per request kind (chat, sms, voice, summary...)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_kind: dict[str, dict] = {}
+
+    def record(self, kind: str, messages: list[dict]) -> int:
+        tokens = sum(count_text_tokens(m.get("content") or "") + 4 for m in messages)  # ~4 tokens of chat framing
+        with self._lock:
+            s = self._by_kind.setdefault(kind, {"requests": 0, "prompt_tokens": 0, "max_prompt_tokens": 0})
+            s["requests"] += 1
+            s["prompt_tokens"] += tokens
+            s["max_prompt_tokens"] = max(s["max_prompt_tokens"], tokens)
+        logger.info(f"prompt kind={kind} prompt_tokens={tokens}")
+        return tokens
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                kind: {**s, "avg_prompt_tokens": round(s["prompt_tokens"] / s["requests"])}
+                for kind, s in self._by_kind.items()
+            }
+
+
+prompt_stats = PromptStats()
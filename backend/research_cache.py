@@ -0,0 +1,139 @@
+"""
+Research result cache: normalized query -> AGI answer.
+
+Two tiers: a size-bounded in-memory LRU and the research_results table, so
+answers survive restarts. Both honour RESEARCH_CACHE_TTL. Concurrent requests
+for the same query are coalesced onto one in-flight AGI session.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import delete
+
+from database import AsyncSessionLocal
+from models import ResearchResult as ResearchResultORM
+
+RESEARCH_CACHE_TTL = float(os.getenv("RESEARCH_CACHE_TTL", str(6 * 3600)))
+RESEARCH_CACHE_SIZE = int(os.getenv("RESEARCH_CACHE_SIZE", "256"))
+
+
+def normalize_query(query: str) -> str:
+    q = re.sub(r"\s+", " ", query.lower()).strip()
+    return q.rstrip("?!. ")
+
+
+def _key(normalized: str) -> str:
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _utcnow_naive() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ResearchCache:
+    def __init__(self, ttl: float = RESEARCH_CACHE_TTL, size: int = RESEARCH_CACHE_SIZE):
+        self._ttl = ttl
+        self._size = size
+        self._lru: OrderedDict[str, tuple[str, float]] = OrderedDict()  # key -> (result, stored_at monotonic)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _remember(self, key: str, result: str, age: float = 0.0):
+        self._lru[key] = (result, time.monotonic() - age)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._size:
+            self._lru.popitem(last=False)
+
+    def _from_memory(self, key: str) -> str | None:
+        entry = self._lru.get(key)
+        if entry is not None:
+            result, stored_at = entry
+            if time.monotonic() - stored_at <= self._ttl:
+                self._lru.move_to_end(key)
+                return result
+            self._lru.pop(key, None)
+        return None
+
+    async def lookup(self, query: str) -> str | None:
+        """Cached answer for `query` (memory, then DB), or None."""
+        key = _key(normalize_query(query))
+        result = self._from_memory(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        try:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(ResearchResultORM, key)
+        except Exception as e:
+            logger.warning(f"Research cache DB lookup failed: {e}")
+            row = None
+        if row is not None:
+            age = (_utcnow_naive() - row.created_at).total_seconds()
+            if age <= self._ttl:
+                self._remember(key, row.result, age)
+                self.hits += 1
+                return row.result
+        self.misses += 1
+        return None
+
+    async def get_or_compute(self, query: str, compute, *, looked_up: bool = False) -> str:
+        """Return the cached answer or run `await compute(query)` once per unique query.
+
+        `compute` should raise on failure; only successful answers are cached. Pass
+        looked_up=True when the caller already missed on lookup(): only the memory tier
+        is re-checked (an answer finished in between), with no DB read or stats."""
+        normalized = normalize_query(query)
+        key = _key(normalized)
+        cached = self._from_memory(key) if looked_up else await self.lookup(query)
+        if cached is not None:
+            return cached
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await compute(query)
+            self._remember(key, result)
+            await self._persist(key, normalized, result)
+            fut.set_result(result)
+            return result
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _persist(self, key: str, normalized: str, result: str):
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.merge(ResearchResultORM(query_key=key, query=normalized, result=result,
+                                                 created_at=_utcnow_naive()))
+                await db.execute(delete(ResearchResultORM).where(
+                    ResearchResultORM.created_at < _utcnow_naive() - timedelta(seconds=self._ttl)))
+                await db.commit()
+        except Exception as e:
+            logger.warning(f"Research cache DB write failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "entries": len(self._lru),
+        }
+
+
+research_cache = ResearchCache()
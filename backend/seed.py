@@ -9,12 +9,11 @@ import uuid
 import bcrypt
 from datetime import datetime, timezone
 
-from database import SessionLocal, engine, Base
+from database import SessionLocal, reset_schema
 from models import User, UserCredential
 
-# Recreate all tables (drops existing so we get a clean schema)
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
+# Recreate all tables through the migrations (drops existing so we get a clean schema)
+reset_schema()
 
 db = SessionLocal()
 
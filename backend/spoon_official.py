@@ -1,8 +1,10 @@
-from typing import Dict, TypedDict, Optional
+import threading
+from typing import Dict, Iterator, AsyncIterator, TypedDict, Optional
 from langgraph.graph import StateGraph, START, END
 from openai import OpenAI
 
 from config import CLIENTS, OPENAI_MODEL
+from spoon_os import MEMBER_TIMEOUT, fan_out
 
 # ----- State schema required by StateGraph -----
 class TeamState(TypedDict, total=False):
@@ -29,6 +31,7 @@ def _chat_as(agent_id: str, sys_ctx: str, asker: str, prompt: str, temperature:
         model=OPENAI_MODEL,
         messages=msgs,
         temperature=temperature,
+        timeout=MEMBER_TIMEOUT,
     )
     return resp.choices[0].message.content
 
@@ -39,9 +42,8 @@ def node_ask_one(state: TeamState) -> TeamState:
     return {"drafts": {target: text}}
 
 def node_ask_team(state: TeamState) -> TeamState:
-    drafts: Dict[str, str] = {}
-    for member in TEAM:
-        drafts[member] = _chat_as(member, state["sys_ctx"], state["asker"], state["prompt"], 0.4)
+    # Concurrent fan-out with per-member timeout; slow or failing members are dropped from drafts
+    drafts = fan_out(TEAM, lambda m: _chat_as(m, state["sys_ctx"], state["asker"], state["prompt"], 0.4))
     return {"drafts": drafts}
 
 def node_synthesize(state: TeamState) -> TeamState:
@@ -75,34 +77,63 @@ class _Compiled:
     async def ainvoke(self, inputs: Dict):
         return await self._app.ainvoke(inputs)
 
+    def stream(self, inputs: Dict) -> Iterator[Dict]:
+        """Yield each node's state update as it finishes, e.g. {"ask_team": {"drafts": ...}}
+        before {"synthesize": {"synthesis": ...}}, so drafts can be shown early."""
+        yield from self._app.stream(inputs, stream_mode="updates")
+
+    async def astream(self, inputs: Dict) -> AsyncIterator[Dict]:
+        async for update in self._app.astream(inputs, stream_mode="updates"):
+            yield update
+
+# Linear node chains per entry point. "team_synthesize" = ask_team -> synthesize in one graph.
+_PIPELINES = {
+    "ask_one": [("ask_one", node_ask_one)],
+    "ask_team": [("ask_team", node_ask_team)],
+    "synthesize": [("synthesize", node_synthesize)],
+    "team_synthesize": [("ask_team", node_ask_team), ("synthesize", node_synthesize)],
+}
+
+# Compiled graphs are immutable and safe to share, so each entry point is compiled once per process.
+_COMPILED: Dict[str, _Compiled] = {}
+_COMPILE_LOCK = threading.Lock()
+
+def _build_graph(entry: str) -> StateGraph:
+    g = StateGraph(state_schema=TeamState)
+    prev = START
+    for name, fn in _PIPELINES[entry]:
+        g.add_node(name, fn)
+        g.add_edge(prev, name)
+        prev = name
+    g.add_edge(prev, END)
+    return g
+
+def compiled_graph(entry: str) -> _Compiled:
+    compiled = _COMPILED.get(entry)
+    if compiled is None:
+        with _COMPILE_LOCK:
+            compiled = _COMPILED.get(entry)
+            if compiled is None:
+                compiled = _COMPILED[entry] = _Compiled(_build_graph(entry))
+    return compiled
+
+def warm_team_graphs():
+    """Compile every entry point up front so no request pays for it (main.py runs this at
+    startup when SPOON_IMPL=official)."""
+    for entry in _PIPELINES:
+        compiled_graph(entry)
+
 class TeamGraph:
     def __init__(self):
         self._entry = "ask_team"
 
     def set_entry_point(self, name: str):
-        if name not in ("ask_one", "ask_team", "synthesize"):
+        if name not in _PIPELINES:
             raise ValueError(f"Unknown entry point: {name}")
         self._entry = name
 
     def compile(self):
-        g = StateGraph(state_schema=TeamState)
-
-        if self._entry == "ask_one":
-            g.add_node("ask_one", node_ask_one)
-            g.add_edge(START, "ask_one")
-            g.add_edge("ask_one", END)
-
-        elif self._entry == "ask_team":
-            g.add_node("ask_team", node_ask_team)
-            g.add_edge(START, "ask_team")
-            g.add_edge("ask_team", END)
-
-        elif self._entry == "synthesize":
-            g.add_node("synthesize", node_synthesize)
-            g.add_edge(START, "synthesize")
-            g.add_edge("synthesize", END)
-
-        return _Compiled(g)
+        return compiled_graph(self._entry)
 
 def build_team_graph() -> TeamGraph:
     return TeamGraph()
@@ -1,10 +1,35 @@
-from typing import Dict
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable
+from loguru import logger
 from openai import OpenAI
 from config import CLIENTS, OPENAI_MODEL
 
 TEAM = ["yug", "sean", "severin", "nayab"]
 NAMES = {"yug":"Yug","sean":"Sean","severin":"Severin","nayab":"Nayab"}
 
+# Team questions fan out to every member at once; latency ~ the slowest member, capped by this timeout.
+MEMBER_TIMEOUT = float(os.getenv("TEAM_MEMBER_TIMEOUT", "30"))
+_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("TEAM_FANOUT_WORKERS", "16")), thread_name_prefix="team")
+
+def fan_out(members: Iterable[str], call: Callable[[str], str], timeout: float = MEMBER_TIMEOUT) -> Dict[str,str]:
+    """Run `call(member)` for every member concurrently. Members that fail or miss the
+    timeout are left out, so callers get partial results instead of an error."""
+    futures = {_POOL.submit(call, m): m for m in members}
+    done, pending = wait(futures, timeout=timeout)
+    drafts: Dict[str,str] = {}
+    for fut in done:
+        member = futures[fut]
+        try:
+            drafts[member] = fut.result()
+        except Exception as e:
+            logger.warning(f"Team member {member} failed: {e}")
+    for fut in pending:
+        fut.cancel()
+        logger.warning(f"Team member {futures[fut]} timed out after {timeout}s")
+    # Keep TEAM order so synthesis input is stable
+    return {m: drafts[m] for m in futures.values() if m in drafts}
+
 def _chat_as(agent_id: str, sys_ctx: str, asker: str, prompt: str, temperature=0.35) -> str:
     client: OpenAI = CLIENTS[agent_id]
     name = NAMES.get(agent_id, agent_id.title())
@@ -13,14 +38,15 @@ def _chat_as(agent_id: str, sys_ctx: str, asker: str, prompt: str, temperature=0
         {"role":"system","content": f"You are {name}. Provide your perspective."},
         {"role":"user","content": f"{asker} asks:\n{prompt}"},
     ]
-    resp = client.chat.completions.create(model=OPENAI_MODEL, messages=msgs, temperature=temperature)
+    resp = client.chat.completions.create(model=OPENAI_MODEL, messages=msgs, temperature=temperature,
+                                          timeout=MEMBER_TIMEOUT)
     return resp.choices[0].message.content
 
 def ask_one(asker: str, prompt: str, sys_ctx: str, target: str) -> Dict[str,str]:
     return {target: _chat_as(target, sys_ctx, asker, prompt, 0.35)}
 
 def ask_team(asker: str, prompt: str, sys_ctx: str) -> Dict[str,str]:
-    return {m: _chat_as(m, sys_ctx, asker, prompt, 0.4) for m in TEAM}
+    return fan_out(TEAM, lambda m: _chat_as(m, sys_ctx, asker, prompt, 0.4))
 
 def synthesize(asker: str, prompt: str, sys_ctx: str, drafts: Dict[str,str]) -> str:
     msgs = [
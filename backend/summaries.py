@@ -0,0 +1,287 @@
+"""
+Incremental, hierarchical summarization of the shared message log.
+
+The log is cut into fixed time windows (SUMMARY_WINDOW_HOURS). Each window
+has a stored SummaryChunk with a checkpoint (newest created_at, id folded in),
+so a refresh only reads messages newer than the last checkpoint and folds them
+into their window's summary (map). A report merges the window summaries,
+grouping them into intermediate summaries when they don't fit one prompt
+(reduce). History size no longer bounds memory, and nothing past a cutoff is
+silently dropped.
+
+A row can commit after newer rows were already folded (e.g. /chat stages the
+user message before the LLM call). Each refresh therefore recounts the windows
+touching the last SUMMARY_LATE_WRITE_SECONDS before the checkpoint and rebuilds
+any that now hold more rows than were folded into them.
+"""
+
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+from sqlalchemy import and_, or_, select
+
+import archive
+from config import OPENAI_MODEL
+from database import AsyncSessionLocal
+from models import Message as MessageORM, SummaryChunk as SummaryChunkORM
+from prompting import count_text_tokens, truncate_text_tokens, prompt_stats, SUMMARY_INPUT_TOKENS
+
+SUMMARY_WINDOW_HOURS = float(os.getenv("SUMMARY_WINDOW_HOURS", "6"))
+# Max tokens of new message text folded into a window summary per LLM call.
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+# Per-message cap inside a chunk batch, so one huge paste can't fill a batch alone.
+SUMMARY_LINE_TOKENS = int(os.getenv("SUMMARY_LINE_TOKENS", "400"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+# How far before the checkpoint a late-committing row can land and still be picked up.
+SUMMARY_LATE_WRITE_SECONDS = float(os.getenv("SUMMARY_LATE_WRITE_SECONDS", "900"))
+PAGE_SIZE = 500
+
+CHUNK_PROMPT = (
+    "You maintain a running summary of one time slice of a team workspace conversation. "
+    "Keep who said what, decisions, action items, open questions and notable timestamps. "
+    "If an existing summary is given, return it updated with the new messages. "
+    "Be concise; use bullet points."
+)
+MERGE_PROMPT = (
+    "Merge these consecutive summaries of a team workspace conversation into one summary "
+    "of the whole period. Keep chronology, decisions, action items and participants. "
+    "Be concise; use bullet points."
+)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _window_start(ts: datetime) -> datetime:
+    step = timedelta(hours=SUMMARY_WINDOW_HOURS)
+    return _EPOCH + ((ts - _EPOCH) // step) * step
+
+
+def _line(m: MessageORM) -> str:
+    content = truncate_text_tokens(m.content or "", SUMMARY_LINE_TOKENS)
+    return f"[{m.created_at.strftime('%Y-%m-%d %H:%M')}] {m.sender_name} ({m.role}): {content}"
+
+
+async def _complete(client, kind: str, system: str, user: str) -> str:
+    messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+    prompt_stats.record(kind, messages)
+    resp = await client.chat.completions.create(model=OPENAI_MODEL, messages=messages)
+    return (resp.choices[0].message.content or "").strip()
+
+
+class _WindowDelta:
+    """New messages for one window since its checkpoint, pre-split into token-bounded batches."""
+
+    def __init__(self, start: datetime, rebuild: bool = False):
+        self.start = start
+        self.rebuild = rebuild  # replaces the stored window summary instead of extending it
+        self.batches: list[list[str]] = [[]]
+        self._batch_tokens = 0
+        self.count = 0
+        self.last: tuple[datetime, str] | None = None
+
+    def add(self, m: MessageORM):
+        line = _line(m)
+        cost = count_text_tokens(line) + 1
+        if self.batches[-1] and self._batch_tokens + cost > SUMMARY_CHUNK_TOKENS:
+            self.batches.append([])
+            self._batch_tokens = 0
+        self.batches[-1].append(line)
+        self._batch_tokens += cost
+        self.count += 1
+        self.last = (m.created_at, m.id)
+
+
+class ConversationSummarizer:
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.messages_folded = 0
+        self.chunk_calls = 0
+        self.merge_calls = 0
+        self.windows_rebuilt = 0
+
+    async def _checkpoint(self, db) -> tuple[datetime, str] | None:
+        row = (await db.execute(
+            select(SummaryChunkORM.last_created_at, SummaryChunkORM.last_message_id)
+            .order_by(SummaryChunkORM.last_created_at.desc(), SummaryChunkORM.last_message_id.desc())
+            .limit(1)
+        )).first()
+        return (row[0], row[1]) if row else None
+
+    async def _new_messages(self, db, after: tuple[datetime, str] | None) -> dict[datetime, _WindowDelta]:
+        """Keyset-page through messages newer than `after`, grouped by window.
+        Archived days newer than the checkpoint (only on a first or long-stale run) come first."""
+        deltas: dict[datetime, _WindowDelta] = {}
+
+        def add(m: MessageORM):
+            start = _window_start(m.created_at)
+            delta = deltas.get(start)
+            if delta is None:
+                delta = deltas[start] = _WindowDelta(start)
+            delta.add(m)
+
+        async for m in archive.aiter_after(db, after):
+            add(m)
+        while True:
+            stmt = select(MessageORM).order_by(MessageORM.created_at.asc(), MessageORM.id.asc()).limit(PAGE_SIZE)
+            if after is not None:
+                ts, mid = after
+                stmt = stmt.where(or_(MessageORM.created_at > ts,
+                                      and_(MessageORM.created_at == ts, MessageORM.id > mid)))
+            page = (await db.execute(stmt)).scalars().all()
+            for m in page:
+                add(m)
+            if len(page) < PAGE_SIZE:
+                return deltas
+            after = (page[-1].created_at, page[-1].id)
+            db.expunge_all()
+
+    async def _late_windows(self, db, checkpoint: tuple[datetime, str]) -> set[datetime]:
+        """Windows near the checkpoint holding more rows (up to the checkpoint) than were
+        folded: a row committed late, behind rows already summarized."""
+        since = _window_start(checkpoint[0] - timedelta(seconds=SUMMARY_LATE_WRITE_SECONDS))
+        ts, mid = checkpoint
+        rows = (await db.execute(
+            select(MessageORM.created_at).where(
+                MessageORM.created_at >= since,
+                or_(MessageORM.created_at < ts, and_(MessageORM.created_at == ts, MessageORM.id <= mid)))
+        )).scalars().all()
+        counts = Counter(_window_start(t) for t in rows)
+        stored = dict((await db.execute(
+            select(SummaryChunkORM.window_start, SummaryChunkORM.message_count)
+            .where(SummaryChunkORM.window_start >= since)
+        )).all())
+        return {w for w, n in counts.items() if n > stored.get(w, 0)}
+
+    async def _window_messages(self, db, start: datetime) -> _WindowDelta:
+        """Every message in one window (archived first, then hot), for a rebuild."""
+        end = start + timedelta(hours=SUMMARY_WINDOW_HOURS)
+        delta = _WindowDelta(start, rebuild=True)
+        async for m in archive.aiter_between(db, start, end):
+            delta.add(m)
+        page = (await db.execute(
+            select(MessageORM)
+            .where(MessageORM.created_at >= start, MessageORM.created_at < end)
+            .order_by(MessageORM.created_at.asc(), MessageORM.id.asc())
+        )).scalars().all()
+        for m in page:
+            delta.add(m)
+        return delta
+
+    async def _fold(self, client, previous: str | None, delta: _WindowDelta) -> str:
+        """Map step for one window: fold each new batch into the window's running summary."""
+        summary = previous
+        for batch in delta.batches:
+            if not batch:
+                continue
+            existing = f"Existing summary:\n{summary}\n\n" if summary else ""
+            summary = await _complete(client, "summary_chunk", CHUNK_PROMPT,
+                                      f"{existing}New messages:\n" + "\n".join(batch))
+            self.chunk_calls += 1
+        return summary or ""
+
+    async def refresh(self, client) -> list[SummaryChunkORM]:
+        """Bring the stored window summaries up to date; returns all chunks oldest-first."""
+        async with self._lock:
+            async with AsyncSessionLocal() as db:
+                checkpoint = await self._checkpoint(db)
+                deltas = await self._new_messages(db, checkpoint)
+                if checkpoint is not None:
+                    for start in sorted(await self._late_windows(db, checkpoint)):
+                        deltas[start] = await self._window_messages(db, start)
+                        self.windows_rebuilt += 1
+                existing = {}
+                if deltas:
+                    rows = (await db.execute(
+                        select(SummaryChunkORM).where(SummaryChunkORM.window_start.in_(list(deltas)))
+                    )).scalars().all()
+                    existing = {r.window_start: r for r in rows}
+                # No connection is held while the LLM calls run.
+                await db.commit()
+
+            if deltas:
+                sem = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+                async def fold(delta: _WindowDelta):
+                    async with sem:
+                        prev = None if delta.rebuild else existing.get(delta.start)
+                        return delta, await self._fold(client, prev.summary if prev else None, delta)
+
+                folded = await asyncio.gather(*(fold(d) for d in deltas.values()))
+                now = datetime.now(timezone.utc).replace(tzinfo=None)
+                async with AsyncSessionLocal() as db:
+                    for delta, text in folded:
+                        prev = None if delta.rebuild else existing.get(delta.start)
+                        await db.merge(SummaryChunkORM(
+                            window_start=delta.start,
+                            window_end=delta.start + timedelta(hours=SUMMARY_WINDOW_HOURS),
+                            summary=text,
+                            message_count=(prev.message_count if prev else 0) + delta.count,
+                            last_created_at=delta.last[0],
+                            last_message_id=delta.last[1],
+                            updated_at=now,
+                        ))
+                        self.messages_folded += delta.count
+                    await db.commit()
+                logger.info(f"Summaries: folded {sum(d.count for d in deltas.values())} new messages "
+                            f"into {len(deltas)} window(s)")
+
+            async with AsyncSessionLocal() as db:
+                return (await db.execute(
+                    select(SummaryChunkORM).order_by(SummaryChunkORM.window_start.asc())
+                )).scalars().all()
+
+    async def _reduce(self, client, parts: list[str]) -> str:
+        """Merge consecutive summaries until they fit one SUMMARY_INPUT_TOKENS prompt."""
+        while sum(count_text_tokens(p) + 2 for p in parts) > SUMMARY_INPUT_TOKENS and len(parts) > 1:
+            groups: list[list[str]] = [[]]
+            used = 0
+            for p in parts:
+                cost = count_text_tokens(p) + 2
+                if groups[-1] and used + cost > SUMMARY_INPUT_TOKENS:
+                    groups.append([])
+                    used = 0
+                groups[-1].append(p)
+                used += cost
+            if len(groups) == len(parts):
+                # Each part alone fills the budget: merge pairwise so the loop still shrinks.
+                groups = [parts[i:i + 2] for i in range(0, len(parts), 2)]
+            sem = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+            async def merge(group: list[str]) -> str:
+                if len(group) == 1:
+                    return group[0]
+                async with sem:
+                    self.merge_calls += 1
+                    return await _complete(client, "summary_merge", MERGE_PROMPT, "\n\n".join(group))
+
+            parts = list(await asyncio.gather(*(merge(g) for g in groups)))
+        return "\n\n".join(parts)
+
+    async def report(self, client, system_prompt: str) -> tuple[str, int]:
+        """Final report over the whole history. Returns (report text, messages covered)."""
+        chunks = await self.refresh(client)
+        if not chunks:
+            return "", 0
+        parts = [
+            f"## {c.window_start.strftime('%Y-%m-%d %H:%M')} – {c.window_end.strftime('%H:%M')} UTC "
+            f"({c.message_count} messages)\n{c.summary}"
+            for c in chunks
+        ]
+        merged = await self._reduce(client, parts)
+        text = await _complete(client, "summary", system_prompt,
+                               f"Here are summaries of the conversation, oldest first:\n\n{merged}")
+        return text, sum(c.message_count for c in chunks)
+
+    def stats(self) -> dict:
+        return {
+            "messages_folded": self.messages_folded,
+            "chunk_calls": self.chunk_calls,
+            "merge_calls": self.merge_calls,
+            "windows_rebuilt": self.windows_rebuilt,
+        }
+
+
+summarizer = ConversationSummarizer()
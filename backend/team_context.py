@@ -0,0 +1,175 @@
+"""
+Shared team-context cache for system prompts (chat, SMS, voice).
+
+Holds ring buffers of the most recent Activity and Message rows. Buffers are
+loaded from the DB once, then updated in place from the event hub as rows are
+committed, so building a prompt is a memory read. Writes made by other
+processes are picked up when the cache ages out (TEAM_CONTEXT_TTL seconds).
+
+Which messages make it into the prompt is decided by ContextWindow: the newest
+rows, read through the (created_at, id) index, optionally trimmed to a token
+budget instead of a fixed row count.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from events import MESSAGE_FIELDS, ACTIVITY_FIELDS, hub
+from models import Message as MessageORM, Activity as ActivityORM
+from prompting import MESSAGE_TOKEN_CAP, fit_newest_first, truncate_to_tokens
+
+ACTIVITY_LIMIT = 15
+TEAM_CONTEXT_TTL = float(os.getenv("TEAM_CONTEXT_TTL", "300"))
+# Upper bound on messages considered; with a token budget set, the budget usually binds first.
+PROMPT_CONTEXT_MESSAGES = int(os.getenv("PROMPT_CONTEXT_MESSAGES", "30"))
+# Token budget for the SHARED CONVERSATION section; 0 = no budget, just the newest rows.
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", "2000"))
+
+
+def _row(obj, fields) -> dict:
+    return {f: getattr(obj, f) for f in fields}
+
+
+class ContextWindow:
+    """Selects the conversation slice for a prompt: newest first, bounded by rows and tokens."""
+
+    def __init__(self, max_messages: int = PROMPT_CONTEXT_MESSAGES, token_budget: int = PROMPT_CONTEXT_TOKENS):
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+
+    def stmt(self):
+        """Newest `max_messages` rows; ordering matches ix_messages_created_at_id (scanned backwards)."""
+        return (select(MessageORM)
+                .order_by(MessageORM.created_at.desc(), MessageORM.id.desc())
+                .limit(self.max_messages))
+
+    @staticmethod
+    def line(m: dict) -> str:
+        return f"{m['sender_name']}: {truncate_to_tokens(m['content'], MESSAGE_TOKEN_CAP)}"
+
+    def fit(self, newest_first) -> list[str]:
+        """Prompt lines, oldest first, keeping as many of the newest messages as the budget allows."""
+        return fit_newest_first((self.line(m) for m in newest_first), self.token_budget, self.max_messages)
+
+
+class TeamContextCache:
+    """Recent activity + shared conversation, kept warm in memory."""
+
+    def __init__(self, activity_limit: int = ACTIVITY_LIMIT, window: ContextWindow | None = None,
+                 ttl: float = TEAM_CONTEXT_TTL):
+        self._lock = threading.Lock()
+        self.window = window or ContextWindow()
+        self._activities: deque[dict] = deque(maxlen=activity_limit)
+        self._messages: deque[dict] = deque(maxlen=self.window.max_messages)
+        self._ttl = ttl
+        self._loaded_at: float | None = None
+        self._sections: tuple[str, str] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    # ── reads ──
+
+    def peek(self) -> tuple[str, str] | None:
+        """(activity_text, history_text) if the cache is warm, else None."""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self._ttl:
+                return None
+            self.hits += 1
+            if self._sections is None:
+                self._sections = self._render()
+            return self._sections
+
+    def sections(self, db: Session | None = None) -> tuple[str, str]:
+        cached = self.peek()
+        if cached is not None:
+            return cached
+        if db is not None:
+            return self.load(db)
+        db = SessionLocal()
+        try:
+            return self.load(db)
+        finally:
+            db.close()
+
+    async def asections(self, db: AsyncSession) -> tuple[str, str]:
+        cached = self.peek()
+        if cached is not None:
+            return cached
+        activities = (await db.execute(self._activity_stmt())).scalars().all()
+        messages = (await db.execute(self._message_stmt())).scalars().all()
+        return self._fill(activities, messages)
+
+    def context_text(self, db: Session | None = None) -> str:
+        activity_text, history = self.sections(db)
+        return f"== TEAM ACTIVITY ==\n{activity_text}\n\n== SHARED CONVERSATION ==\n{history}"
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "activities": len(self._activities),
+                "messages": len(self._messages),
+            }
+
+    # ── loading ──
+
+    def load(self, db: Session) -> tuple[str, str]:
+        activities = db.execute(self._activity_stmt()).scalars().all()
+        messages = db.execute(self._message_stmt()).scalars().all()
+        return self._fill(activities, messages)
+
+    def _activity_stmt(self):
+        return select(ActivityORM).order_by(ActivityORM.created_at.desc()).limit(self._activities.maxlen)
+
+    def _message_stmt(self):
+        return self.window.stmt()
+
+    def _fill(self, activities, messages) -> tuple[str, str]:
+        """Replace both buffers from newest-first query results."""
+        with self._lock:
+            self.misses += 1
+            self._activities.clear()
+            self._activities.extend(_row(a, ACTIVITY_FIELDS) for a in reversed(activities))
+            self._messages.clear()
+            self._messages.extend(_row(m, MESSAGE_FIELDS) for m in reversed(messages))
+            self._loaded_at = time.monotonic()
+            self._sections = self._render()
+            return self._sections
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+            self._sections = None
+
+    # ── in-place updates (event hub listener) ──
+
+    def on_event(self, kind: str, data: dict, user_id: str | None = None):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # cold: the next read loads from the DB anyway
+            if kind == "message":
+                self._messages.append(data)
+            elif kind == "activity":
+                self._activities.append(data)
+            else:
+                return
+            self._sections = None
+
+    def _render(self) -> tuple[str, str]:
+        activity_text = "\n".join(f"- {a['user_name']}: {a['summary']}" for a in self._activities) or "(none)"
+        history = "\n".join(self.window.fit(reversed(self._messages))) or "(none)"
+        return activity_text, history
+
+
+team_context = TeamContextCache()
+hub.add_listener(team_context.on_event)
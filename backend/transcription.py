@@ -0,0 +1,178 @@
+"""
+Bounded-memory call transcription.
+
+Recordings are streamed to a temp file, cut into MP3 byte ranges of at most
+WHISPER_CHUNK_BYTES (split on frame boundaries, so every piece is a playable
+MP3), and the pieces are transcribed concurrently on a shared pool capped at
+WHISPER_MAX_CONCURRENT requests, then stitched back in order. Memory per call
+is one chunk per in-flight request instead of the whole recording.
+
+RecordingInbox hands the recording URL from /voice/recording-callback to the
+transcription job waiting on that call UUID, so pickup doesn't poll Plivo. It
+only accepts call UUIDs we started a recording for, and only Plivo media URLs.
+"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+import http_client
+
+# Whisper rejects uploads over 25 MB; stay well under it.
+WHISPER_CHUNK_BYTES = int(os.getenv("WHISPER_CHUNK_BYTES", str(8 * 1024 * 1024)))
+WHISPER_MAX_CONCURRENT = int(os.getenv("WHISPER_MAX_CONCURRENT", "4"))
+_SCAN_BYTES = 64 * 1024
+# How long a transcription job waits for Plivo's recording callback before polling.
+RECORDING_CALLBACK_TIMEOUT = float(os.getenv("RECORDING_CALLBACK_TIMEOUT", "20"))
+# Callbacks nobody claims (e.g. handled by another worker process) are dropped after this.
+_UNCLAIMED_TTL = 600
+# Recordings that never produce a callback stop being expected after this.
+_EXPECTED_TTL = 6 * 3600
+# Hosts Plivo serves recording files from.
+PLIVO_MEDIA_HOST_SUFFIX = ".plivo.com"
+
+_POOL = ThreadPoolExecutor(max_workers=WHISPER_MAX_CONCURRENT, thread_name_prefix="whisper")
+
+
+def download_to_tempfile(url: str, suffix: str = ".mp3", timeout: float = 60) -> str:
+    """Stream `url` into a new temp file and return its path (caller deletes it)."""
+    fd, path = tempfile.mkstemp(prefix="recording-", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            size = http_client.download(url, f, timeout=timeout)
+    except BaseException:
+        os.unlink(path)
+        raise
+    logger.info(f"Downloaded recording to {path} ({size} bytes)")
+    return path
+
+
+def _is_frame_header(b: bytes, i: int) -> bool:
+    """True if b[i:i+3] looks like an MPEG audio frame header."""
+    if i + 2 >= len(b) or b[i] != 0xFF or (b[i + 1] & 0xE0) != 0xE0:
+        return False
+    version = (b[i + 1] >> 3) & 0x3
+    layer = (b[i + 1] >> 1) & 0x3
+    bitrate = b[i + 2] >> 4
+    sample_rate = (b[i + 2] >> 2) & 0x3
+    return version != 1 and layer != 0 and bitrate not in (0, 15) and sample_rate != 3
+
+
+def mp3_chunks(path: str, max_bytes: int = WHISPER_CHUNK_BYTES) -> list[tuple[int, int]]:
+    """(offset, length) ranges of at most ~max_bytes, each starting on a frame header."""
+    size = os.path.getsize(path)
+    if size <= max_bytes:
+        return [(0, size)]
+    bounds = [0]
+    with open(path, "rb") as f:
+        target = max_bytes
+        while target < size:
+            f.seek(target)
+            window = f.read(_SCAN_BYTES)
+            cut = next((i for i in range(len(window)) if _is_frame_header(window, i)), None)
+            if cut is None:
+                cut = 0  # no header nearby (not MP3?): cut at the byte boundary
+            bounds.append(target + cut)
+            target = bounds[-1] + max_bytes
+    bounds.append(size)
+    return [(start, end - start) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def _transcribe_range(client, path: str, offset: int, length: int, index: int, language: str) -> str:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        audio = io.BytesIO(f.read(length))
+    audio.name = f"call_recording_{index}.mp3"
+    resp = client.audio.transcriptions.create(model="whisper-1", file=audio, language=language)
+    return (resp.text or "").strip()
+
+
+def transcribe_file(client, path: str, language: str = "en") -> str:
+    """Transcribe an MP3 on disk; long files are split and transcribed concurrently, in order."""
+    ranges = mp3_chunks(path)
+    if len(ranges) > 1:
+        logger.info(f"Transcribing {path} in {len(ranges)} chunks")
+    futures = [
+        _POOL.submit(_transcribe_range, client, path, offset, length, i, language)
+        for i, (offset, length) in enumerate(ranges)
+    ]
+    return " ".join(t for t in (f.result() for f in futures) if t)
+
+
+def is_plivo_media_url(url: str) -> bool:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    return parts.scheme == "https" and (host == PLIVO_MEDIA_HOST_SUFFIX[1:] or host.endswith(PLIVO_MEDIA_HOST_SUFFIX))
+
+
+class RecordingInbox:
+    """Recording-ready queue keyed by call UUID (callback -> waiting transcription job).
+
+    In-process only: with several server processes the callback can land on a
+    different one, in which case the waiter times out and falls back to polling."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._expected: dict[str, float] = {}  # call_uuid -> recording started at
+        self._ready: dict[str, tuple[str, float]] = {}  # call_uuid -> (recording url, received at)
+        self.delivered = 0
+        self.rejected = 0
+        self.claimed = 0
+        self.timeouts = 0
+        self.unexpected = 0
+
+    def _prune(self, now: float):
+        for uuid_, at in list(self._expected.items()):
+            if now - at > _EXPECTED_TTL:
+                del self._expected[uuid_]
+        for uuid_, (_, at) in list(self._ready.items()):
+            if now - at > _UNCLAIMED_TTL:
+                del self._ready[uuid_]
+
+    def expect(self, call_uuid: str):
+        """Register a call whose recording we started; only these can be delivered."""
+        with self._cond:
+            now = time.monotonic()
+            self._prune(now)
+            self._expected[call_uuid] = now
+
+    def deliver(self, call_uuid: str, url: str) -> bool:
+        """Accept a recording URL for an expected call (once). Returns False if rejected."""
+        with self._cond:
+            now = time.monotonic()
+            self._prune(now)
+            if not is_plivo_media_url(url) or self._expected.pop(call_uuid, None) is None:
+                self.rejected += 1
+                return False
+            self._ready[call_uuid] = (url, now)
+            self.delivered += 1
+            self._cond.notify_all()
+            return True
+
+    def wait(self, call_uuid: str, timeout: float = RECORDING_CALLBACK_TIMEOUT) -> str | None:
+        """Block until the recording URL for `call_uuid` arrives (or timeout -> None).
+        Returns None at once when no recording was started for the call (see expect())."""
+        with self._cond:
+            if call_uuid not in self._ready and call_uuid not in self._expected:
+                self.unexpected += 1
+                return None
+            if self._cond.wait_for(lambda: call_uuid in self._ready, timeout=timeout):
+                self.claimed += 1
+                return self._ready.pop(call_uuid)[0]
+            self._expected.pop(call_uuid, None)
+            self.timeouts += 1
+            return None
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"delivered": self.delivered, "rejected": self.rejected, "claimed": self.claimed,
+                    "timeouts": self.timeouts, "unexpected": self.unexpected, "expected": len(self._expected), "unclaimed": len(self._ready)}
+
+
+recordings = RecordingInbox()
@@ -37,6 +37,7 @@ from pipecat.transports.websocket.fastapi import (
     FastAPIWebsocketTransport,
 )
 from pipecat.services.llm_service import FunctionCallParams
+from sqlalchemy import func
 
 from database import SessionLocal
 from models import (
@@ -44,6 +45,8 @@ from models import (
     Message as MessageORM,
     Activity as ActivityORM,
 )
+from team_context import team_context
+from composio_cache import execute_tool
 
 load_dotenv()
 
@@ -118,36 +121,7 @@ class TranscriptCollector(FrameProcessor):
 
 def _get_team_context(caller_name: str) -> str:
     """Build a text snapshot of recent team activity + shared conversation."""
-    db = SessionLocal()
-    try:
-        activities = (
-            db.query(ActivityORM)
-            .order_by(ActivityORM.created_at.desc())
-            .limit(15)
-            .all()
-        )
-        activity_text = (
-            "\n".join(f"- {a.user_name}: {a.summary}" for a in reversed(activities))
-            or "(none)"
-        )
-
-        messages = (
-            db.query(MessageORM)
-            .order_by(MessageORM.created_at.asc())
-            .limit(30)
-            .all()
-        )
-        history = (
-            "\n".join(f"{m.sender_name}: {m.content[:300]}" for m in messages)
-            or "(none)"
-        )
-
-        return (
-            f"== TEAM ACTIVITY ==\n{activity_text}\n\n"
-            f"== SHARED CONVERSATION ==\n{history}"
-        )
-    finally:
-        db.close()
+    return team_context.context_text()
 
 
 def _build_voice_system_prompt(caller_name: str) -> str:
@@ -265,54 +239,22 @@ def _save_call_transcript(caller_name: str, transcript: str, summary: str):
 def _save_transcript_to_google_doc(caller_name: str, transcript: str):
     """Optionally save the transcript to a Google Doc via Composio (best-effort)."""
     try:
-        from config import COMPOSIO_API_KEY, get_composio_client, CLIENTS, OPENAI_MODEL
-
-        composio = get_composio_client()
-        if not composio:
-            logger.info("Composio not configured — skipping Google Doc save")
-            return
-
         user_id = f"parallel-{caller_name.lower()}"
-
-        # Try to get Google Docs tool
-        tools = []
-        try:
-            got = composio.tools.get(user_id=user_id, tools=["GOOGLEDOCS_CREATE_DOCUMENT"])
-            if got:
-                tools = got
-        except Exception:
-            logger.info("Google Docs not connected for user — skipping doc save")
-            return
-
-        if not tools:
-            return
-
-        # Get OpenAI client
-        name_lower = caller_name.strip().lower()
-        client = CLIENTS.get(name_lower) or CLIENTS.get("sean") or next(iter(CLIENTS.values()), None)
-        if not client:
-            return
-
         now_str = datetime.now().strftime("%Y-%m-%d %H:%M")
         doc_title = f"Parallel AI - Voice Call - {caller_name} - {now_str}"
-
-        response = client.chat.completions.create(
-            model=OPENAI_MODEL,
-            tools=tools,
-            messages=[
-                {"role": "system", "content": "Create the Google Doc with the exact content provided."},
-                {"role": "user", "content": (
-                    f"Create a Google Doc titled '{doc_title}' with this content:\n\n"
-                    f"VOICE CALL TRANSCRIPT\n"
-                    f"Caller: {caller_name}\n"
-                    f"Date: {now_str}\n"
-                    f"{'='*40}\n\n"
-                    f"{transcript}"
-                )},
-            ],
+        content = (
+            f"VOICE CALL TRANSCRIPT\n"
+            f"Caller: {caller_name}\n"
+            f"Date: {now_str}\n"
+            f"{'='*40}\n\n"
+            f"{transcript}"
         )
 
-        result = composio.provider.handle_tool_calls(response=response, user_id=user_id)
+        # Arguments are fully known, so call the action directly instead of via an LLM tool call
+        result = execute_tool(user_id, "GOOGLEDOCS_CREATE_DOCUMENT", {"title": doc_title, "text": content})
+        if result is None:
+            logger.info("Composio not configured or Google Docs not connected — skipping doc save")
+            return
         logger.info(f"Google Doc created for call transcript: {str(result)[:200]}")
 
     except Exception as e:
@@ -344,13 +286,19 @@ async def handle_get_teammate_status(params: FunctionCallParams):
     teammate = params.arguments.get("teammate_name", "")
     db = SessionLocal()
     try:
+        # Resolve the name against the (small) users table, then read that user's
+        # timeline via the (user_id, created_at) index instead of scanning activities.
+        name = teammate.strip().lower()
+        user = db.query(UserORM).filter(func.lower(UserORM.name) == name).first() if name else None
+        if user is None and name:
+            user = next((u for u in db.query(UserORM).all() if name in u.name.lower()), None)
         rows = (
             db.query(ActivityORM)
-            .filter(ActivityORM.user_name.ilike(f"%{teammate}%"))
+            .filter(ActivityORM.user_id == user.id)
             .order_by(ActivityORM.created_at.desc())
             .limit(5)
             .all()
-        )
+        ) if user else []
         if rows:
             text = "; ".join(a.summary for a in rows)
             await params.result_callback(
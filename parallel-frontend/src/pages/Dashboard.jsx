@@ -32,6 +32,7 @@ export default function Dashboard() {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streamingText, setStreamingText] = useState(null);
   const [error, setError] = useState("");
   const [online, setOnline] = useState([]);
   const [activity, setActivity] = useState([]);
@@ -46,9 +47,12 @@ export default function Dashboard() {
   const [showSummaryForm, setShowSummaryForm] = useState(false);
   const chatEndRef = useRef(null);
 
+  // Set when older messages are prepended, so the view stays where the user scrolled to.
+  const keepScrollRef = useRef(false);
   useEffect(() => {
+    if (keepScrollRef.current) { keepScrollRef.current = false; return; }
     chatEndRef.current?.scrollIntoView({ behavior: "smooth" });
-  }, [messages, loading]);
+  }, [messages, loading, streamingText]);
 
   useEffect(() => {
     (async () => {
@@ -62,26 +66,69 @@ export default function Dashboard() {
     })();
   }, []);
 
-  // Load messages initially, then poll every 5s for new ones (e.g. voice transcripts)
+  // Load messages once; new ones (chat, voice transcripts, SMS) arrive over /events.
+  // Later refreshes only ask for messages after the newest cursor we hold;
+  // "Load older" pages back (hot table, then archive) from the oldest one.
+  const cursorRef = useRef(null);
+  const etagRef = useRef(null);
+  const prevCursorRef = useRef(null);
+  const [hasOlder, setHasOlder] = useState(false);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const refreshMessages = async () => {
     try {
-      const res = await fetch(`${apiBase}/messages`, { credentials: "include" });
+      const url = cursorRef.current
+        ? `${apiBase}/messages?since=${encodeURIComponent(cursorRef.current)}`
+        : `${apiBase}/messages`;
+      const headers = etagRef.current ? { "If-None-Match": etagRef.current } : {};
+      const res = await fetch(url, { credentials: "include", headers });
+      if (res.status === 304) return;
       if (res.ok) {
         const data = await res.json();
+        const incremental = Boolean(cursorRef.current);
+        etagRef.current = res.headers.get("ETag");
+        cursorRef.current = res.headers.get("X-Next-Cursor") || cursorRef.current;
+        if (!incremental) {
+          prevCursorRef.current = res.headers.get("X-Prev-Cursor");
+          setHasOlder(Boolean(prevCursorRef.current));
+        }
+        setMessages((prev) => {
+          if (!incremental) return data.length !== prev.length ? data : prev;
+          const seen = new Set(prev.map((m) => m.id));
+          const fresh = data.filter((m) => !seen.has(m.id));
+          return fresh.length ? [...prev, ...fresh] : prev;
+        });
+      }
+    } catch (e) { console.error(e); }
+  };
+
+  const loadOlderMessages = async () => {
+    if (!prevCursorRef.current || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const res = await fetch(
+        `${apiBase}/messages?before=${encodeURIComponent(prevCursorRef.current)}`,
+        { credentials: "include" },
+      );
+      if (res.ok) {
+        const data = await res.json();
+        // No header means nothing older is left (hot table and archive exhausted).
+        prevCursorRef.current = res.headers.get("X-Prev-Cursor");
+        setHasOlder(Boolean(prevCursorRef.current));
         setMessages((prev) => {
-          // Only update if count changed (avoids scroll jumps)
-          if (data.length !== prev.length) return data;
-          return prev;
+          const seen = new Set(prev.map((m) => m.id));
+          const older = data.filter((m) => !seen.has(m.id));
+          if (!older.length) return prev;
+          keepScrollRef.current = true;
+          return [...older, ...prev];
         });
       }
     } catch (e) { console.error(e); }
+    finally { setLoadingOlder(false); }
   };
 
   useEffect(() => {
     if (!user.id) return;
     refreshMessages();
-    const id = setInterval(refreshMessages, 2000);
-    return () => clearInterval(id);
   }, [user.id]);
 
   useEffect(() => {
@@ -115,13 +162,42 @@ export default function Dashboard() {
     } catch (e) { console.error(e); }
   };
 
+  const refreshOnline = async () => {
+    try {
+      const res = await fetch(`${apiBase}/online`, { credentials: "include" });
+      if (res.ok) setOnline((await res.json()).members || []);
+    } catch (e) { console.error(e); }
+  };
+
   useEffect(() => {
     if (!user.id) return;
     refreshTeamActivity();
-    const id = setInterval(refreshTeamActivity, 2000);
+    // Presence changes slowly (ONLINE_SECONDS on the backend), so a slow poll is enough
+    const id = setInterval(refreshOnline, 30000);
     return () => clearInterval(id);
   }, [user.id]);
 
+  // Push stream of new messages + team activity (replaces 2s polling)
+  useEffect(() => {
+    if (!user.id) return;
+    const es = new EventSource(`${apiBase}/events`, { withCredentials: true });
+    let opened = false;
+    es.onopen = () => {
+      // On reconnect, resync anything we missed while disconnected
+      if (opened) { refreshMessages(); refreshTeamActivity(); }
+      opened = true;
+    };
+    es.addEventListener("message", (ev) => {
+      const msg = JSON.parse(ev.data);
+      setMessages((prev) => (prev.some((m) => m.id === msg.id) ? prev : [...prev, msg]));
+    });
+    es.addEventListener("activity", (ev) => {
+      const act = JSON.parse(ev.data);
+      setActivity((prev) => (prev.some((a) => a.id === act.id) ? prev : [act, ...prev].slice(0, 50)));
+    });
+    return () => es.close();
+  }, [user.id]);
+
   const sendMessage = async (e) => {
     e?.preventDefault();
     const text = input.trim();
@@ -132,6 +208,10 @@ export default function Dashboard() {
     try {
       const body = { content: text, mode };
       if (mode === "action") body.action_tool = selectedAction;
+      if (mode === "chat") {
+        await streamChat(body);
+        return;
+      }
       const res = await fetch(`${apiBase}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
@@ -143,12 +223,7 @@ export default function Dashboard() {
         throw new Error(err.detail || `Request failed (${res.status})`);
       }
       await res.json();
-      const [msgRes, actRes] = await Promise.all([
-        fetch(`${apiBase}/messages`, { credentials: "include" }),
-        fetch(`${apiBase}/activity`, { credentials: "include" }),
-      ]);
-      if (msgRes.ok) setMessages(await msgRes.json());
-      if (actRes.ok) setActivity(await actRes.json());
+      await Promise.all([refreshMessages(), refreshTeamActivity()]);
     } catch (err) {
       setError(err?.message || "Send failed");
     } finally {
@@ -156,6 +231,48 @@ export default function Dashboard() {
     }
   };
 
+  // Chat mode streams NDJSON from /chat/stream so tokens render as they arrive
+  const streamChat = async (body) => {
+    const res = await fetch(`${apiBase}/chat/stream`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      credentials: "include",
+      body: JSON.stringify(body),
+    });
+    if (!res.ok || !res.body) {
+      const err = await res.json().catch(() => ({}));
+      throw new Error(err.detail || `Request failed (${res.status})`);
+    }
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = "";
+    let text = "";
+    setStreamingText("");
+    try {
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split("\n");
+        buffered = lines.pop();
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const ev = JSON.parse(line);
+          if (ev.type === "token") {
+            text += ev.delta;
+            setStreamingText(text);
+          } else if (ev.type === "done") {
+            setMessages((prev) => (prev.some((m) => m.id === ev.message.id) ? prev : [...prev, ev.message]));
+          } else if (ev.type === "error") {
+            setError(ev.error || "Stream failed");
+          }
+        }
+      }
+    } finally {
+      setStreamingText(null);
+    }
+  };
+
   const handleLogout = async () => {
     try { await fetch(`${apiBase}/auth/logout`, { method: "POST", credentials: "include" }); } catch (_) {}
     window.location.reload();
@@ -186,7 +303,8 @@ export default function Dashboard() {
 
   const refreshComposioStatus = async () => {
     try {
-      const res = await fetch(`${apiBase}/composio/status`, { credentials: "include" });
+      // Explicit refresh: bypass the server's status cache
+      const res = await fetch(`${apiBase}/composio/status?refresh=1`, { credentials: "include" });
       if (res.ok) setComposioStatus(await res.json());
     } catch (e) { console.error(e); }
   };
@@ -207,16 +325,21 @@ export default function Dashboard() {
         const err = await res.json().catch(() => ({}));
         throw new Error(err.detail || "Summary generation failed");
       }
-      const data = await res.json();
+      const { job_id } = await res.json();
+      // The summary runs as a background job; poll until it finishes
+      let job;
+      do {
+        await new Promise((r) => setTimeout(r, 1500));
+        const jr = await fetch(`${apiBase}/jobs/${job_id}`, { credentials: "include" });
+        if (!jr.ok) throw new Error("Lost track of the summary job");
+        job = await jr.json();
+      } while (job.status === "queued" || job.status === "running");
+      if (job.status === "error") throw new Error(job.error || "Summary generation failed");
+      const data = job.result || {};
       setShowSummaryForm(false);
       setSummaryEmail("");
       // Refresh messages to show the summary entry
-      const [msgRes, actRes] = await Promise.all([
-        fetch(`${apiBase}/messages`, { credentials: "include" }),
-        fetch(`${apiBase}/activity`, { credentials: "include" }),
-      ]);
-      if (msgRes.ok) setMessages(await msgRes.json());
-      if (actRes.ok) setActivity(await actRes.json());
+      await Promise.all([refreshMessages(), refreshTeamActivity()]);
       const docNote = data.doc_url ? ` Doc: ${data.doc_url}` : "";
       alert(`Summary generated and emailed to ${summaryEmail}!${docNote}`);
     } catch (err) {
@@ -231,7 +354,7 @@ export default function Dashboard() {
     : [{ id: "welcome", sender_name: "agent", role: "assistant", content: `Hey ${user.name} -- how can I help today?` }];
 
   const loadingLabel =
-    mode === "research" ? "Researching (this can take up to 90s)..." :
+    mode === "research" ? "Starting research job..." :
     mode === "action" ? "Running action..." : "Thinking...";
 
   // Clean toolkit names — backend may return "ITEMTOOLKIT(SLUG='GMAIL')" or just "GMAIL"
@@ -326,11 +449,23 @@ export default function Dashboard() {
           )}
 
           <div className="chat-scroll">
+            {hasOlder && (
+              <button
+                type="button"
+                className="load-older-btn"
+                onClick={loadOlderMessages}
+                disabled={loadingOlder}
+              >
+                {loadingOlder ? "Loading…" : "Load older messages"}
+              </button>
+            )}
             {displayMessages.map((m) => (
               <ChatBubble key={m.id} sender={m.role === "user" ? "user" : "ai"} text={m.content} />
             ))}
             {error && <div className="status-bubble error">{error}</div>}
-            {loading && (
+            {streamingText ? (
+              <ChatBubble key="streaming" sender="ai" text={streamingText} />
+            ) : loading && (
               <div className="status-bubble">
                 <span>{loadingLabel}</span>
                 <span className="status-dots"><span></span><span></span><span></span></span>